@@ -0,0 +1,93 @@
+"""
+Cold-start latency of common `yy` commands, each run in a fresh interpreter against a generated repo.
+
+    python benchmarks/import_time.py [--runs 10] [--services 20] [--json results.json] [--max-ms 250]
+
+`--max-ms` makes the script exit non-zero when any command's median exceeds it, so it can gate CI.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+MAIN = "import sys; from yoyo.cli import main; sys.argv = ['yy'] + sys.argv[1:]; main()"
+COMMANDS = {
+    "import yoyo.cli": ["-c", "import yoyo.cli"],
+    "yy list": ["-c", MAIN, "list"],
+    "yy --find s0+ list": ["-c", MAIN, "--find", "s0+", "list"],
+}
+
+
+def make_repo(root: Path, n_services: int):
+    (root / "yoyo.yml").write_text("paths: {}\n")
+    for i in range(n_services):
+        service = root / "services" / f"s{i}"
+        (service / "models").mkdir(parents=True)
+        (service / "main.py").write_text("app = None\n")
+        callee = f"s{i + 1}" if i + 1 < n_services else None
+        links = "from yoyo.service import Service\n" + (f"callee = Service('{callee}')\n" if callee else "")
+        (service / "links.py").write_text(links)
+    (root / "generated").mkdir()
+
+
+def env():
+    """Benchmark this checkout of yoyo rather than whichever is installed."""
+    return {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(REPO), os.getenv("PYTHONPATH")]))}
+
+
+def time_command(args, cwd: Path, runs: int):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=cwd, env=env(), check=True, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def slowest_imports(cwd: Path, n: int = 10):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import yoyo.cli"], cwd=cwd, env=env(),
+                            stderr=subprocess.PIPE, encoding="utf-8", check=True)
+    rows = []
+    for line in result.stderr.splitlines()[1:]:
+        _, self_us, cumulative_us, module = (part.strip() for part in line.replace(':', '|', 1).split('|'))
+        rows.append((int(cumulative_us), module))
+    return sorted(rows, reverse=True)[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--services", type=int, default=20)
+    parser.add_argument("--json", type=Path, default=None)
+    parser.add_argument("--max-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_repo(root, args.services)
+        # `sync` writes graph.json, which commands only load, so they measure the warm-cache path.
+        time_command(["-c", MAIN, "sync"], root, 1)
+        results = {}
+        for name, command in COMMANDS.items():
+            timings = time_command(command, root, args.runs)
+            results[name] = {"median_ms": statistics.median(timings), "min_ms": min(timings)}
+            print(f"{name:<24} median {results[name]['median_ms']:8.1f}ms   min {results[name]['min_ms']:8.1f}ms")
+        print("\nSlowest imports of yoyo.cli (cumulative):")
+        for cumulative_us, module in slowest_imports(root):
+            print(f"  {cumulative_us / 1000:8.1f}ms  {module}")
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+    if args.max_ms is not None and any(r["median_ms"] > args.max_ms for r in results.values()):
+        sys.exit(f"Cold start slower than {args.max_ms}ms.")
+
+
+if __name__ == '__main__':
+    main()
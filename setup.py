@@ -35,6 +35,6 @@ setup(
     packages=[],
     package_dir={"": "."},
     package_data={},
-    install_requires=['dephell==0.*,>=0.8.3', 'fire==0.*,>=0.3.1', 'gitpython==3.*,>=3.1.11', 'loguru==0.*,>=0.5.3', 'networkx==2.*,>=2.5.0', 'ruamel.yaml==0.*,>=0.16.0'],
-    extras_require={"dev": ["pytest==6.*,>=6.1.0"]},
+    install_requires=['dephell==0.*,>=0.8.3', 'docker-py==1.*,>=1.10.6', 'fire==0.*,>=0.3.1', 'httpx<1.0,>=0.21', 'loguru==0.*,>=0.5.3', 'psutil==5.*,>=5.7.3', 'requests==2.*,>=2.25.0', 'ruamel.yaml==0.*,>=0.16.0'],
+    extras_require={"dev": ["pytest==6.*,>=6.1.0"], "fast": ["orjson==3.*,>=3.4.0"], "watch": ["watchfiles==0.*,>=0.18.0"]},
 )
@@ -0,0 +1,17 @@
+"""Helpers shared by tests feeding incremental parsers."""
+import json
+from typing import Any, Iterable, List
+
+
+def split_every(data: bytes, size: int) -> List[bytes]:
+    """`data` cut into chunks of `size` bytes, splitting JSON values and multi-byte characters anywhere."""
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def json_lines(records: Iterable[Any]) -> bytes:
+    """Records as docker streams them back, one JSON object per line."""
+    return b"".join(json.dumps(r, ensure_ascii=False).encode() + b"\r\n" for r in records)
+
+
+def json_array(items: Iterable[Any], separator: str = ", ") -> bytes:
+    return ("[" + separator.join(json.dumps(i, ensure_ascii=False) for i in items) + "]").encode()
@@ -0,0 +1,68 @@
+import errno
+import os
+from pathlib import Path
+
+import pytest
+from yoyo import artifact_store
+from yoyo.artifact_store import ArtifactStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(tmp_path / "store")
+
+
+def installed(tmp_path, venv: str, content: bytes = b"print('hi')\n") -> Path:
+    path = tmp_path / venv / "module.py"
+    path.parent.mkdir(parents=True)
+    path.write_bytes(content)
+    return path
+
+
+def test_store_links_the_file_into_the_store(store, tmp_path):
+    path = installed(tmp_path, "a")
+    obj = store._object(store._store(path))
+    assert os.path.samefile(obj, path)
+
+
+def test_identical_files_share_one_object(store, tmp_path):
+    first, second = installed(tmp_path, "a"), installed(tmp_path, "b")
+    assert store._store(first) == store._store(second)
+    assert os.path.samefile(first, second)
+
+
+def test_object_stored_concurrently_is_left_alone(store, tmp_path, monkeypatch):
+    first, second = installed(tmp_path, "a"), installed(tmp_path, "b")
+    obj = store._object(store._store(first))
+    inode = obj.stat().st_ino
+    # Both builds find the object missing, the second then loses the race to link it.
+    monkeypatch.setattr(Path, "exists", lambda self: False)
+    monkeypatch.setattr(artifact_store.shutil, "copy2", pytest.fail)
+    store._store(second)
+    assert obj.stat().st_ino == inode
+    assert os.path.samefile(first, second)
+    assert first.read_bytes() == b"print('hi')\n"
+
+
+def test_object_is_copied_across_filesystems(store, tmp_path, monkeypatch):
+    path = installed(tmp_path, "a")
+
+    def link(source, dest):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    monkeypatch.setattr(artifact_store.os, "link", link)
+    obj = store._object(store._store(path))
+    assert obj.read_bytes() == path.read_bytes()
+    assert not os.path.samefile(obj, path)
+    assert [p.name for p in obj.parent.iterdir()] == [obj.name]
+
+
+def test_other_link_errors_are_raised(store, tmp_path, monkeypatch):
+    path = installed(tmp_path, "a")
+
+    def link(source, dest):
+        raise PermissionError(errno.EPERM, "Operation not permitted")
+
+    monkeypatch.setattr(artifact_store.os, "link", link)
+    with pytest.raises(PermissionError):
+        store._store(path)
@@ -0,0 +1,64 @@
+import os
+import tarfile
+
+import pytest
+from yoyo.build_context import BuildContext, walk
+from yoyo.config import Config
+from yoyo.graph import Graph
+
+
+@pytest.fixture
+def service_dir(tmp_path):
+    service_dir = tmp_path / "services" / "api"
+    (service_dir / "pkg").mkdir(parents=True)
+    (service_dir / "main.py").write_text("app = None\n")
+    (service_dir / "pkg" / "util.py").write_text("x = 1\n")
+    (service_dir / "__pycache__").mkdir()
+    (service_dir / "__pycache__" / "main.pyc").write_bytes(b"\0")
+    return service_dir
+
+
+def names(root):
+    return sorted(name for name, _ in walk(root))
+
+
+def test_walk_skips_ignored_dirs(service_dir):
+    assert names(service_dir) == ["main.py", "pkg/util.py"]
+
+
+def test_symlink_loop_is_kept_as_a_link(service_dir):
+    os.symlink("..", service_dir / "pkg" / "loop")
+    assert names(service_dir) == ["main.py", "pkg/loop", "pkg/util.py"]
+
+
+def test_symlinked_dirs_and_files_are_not_followed(service_dir, tmp_path):
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (outside / "secret.py").write_text("")
+    os.symlink(outside, service_dir / "shared")
+    os.symlink("main.py", service_dir / "app.py")
+    os.symlink("missing.py", service_dir / "broken.py")
+    assert names(service_dir) == ["app.py", "broken.py", "main.py", "pkg/util.py", "shared"]
+
+
+@pytest.fixture
+def context(service_dir, tmp_path):
+    path_map = Config().absolute_paths(tmp_path)
+    return BuildContext.for_service(path_map, Graph(nodes={"api"}, edges=set()), "api")
+
+
+def test_symlinks_are_sent_as_symlinks(context, service_dir):
+    os.symlink("..", service_dir / "pkg" / "loop")
+    with tarfile.open(fileobj=context.tar()) as tar:
+        loop = tar.getmember("pkg/loop")
+        assert loop.issym() and loop.linkname == ".."
+        assert tar.extractfile("pkg/util.py").read() == b"x = 1\n"
+
+
+def test_digest_follows_link_targets(context, service_dir):
+    link = service_dir / "pkg" / "loop"
+    os.symlink("..", link)
+    before = context.digest()
+    link.unlink()
+    os.symlink(".", link)
+    assert BuildContext.for_service(context.path_map, Graph(nodes={"api"}, edges=set()), "api").digest() != before
@@ -0,0 +1,110 @@
+import json
+
+import pytest
+from helpers import json_lines, split_every
+from yoyo.config import CloudRunSettings, Config
+from yoyo.exceptions import ImageBuildFailed
+from yoyo.graph import Graph
+from yoyo.targets.cloud_run.builds import BuildStreamParser, ImageBuilder
+
+RECORDS = [
+    {"stream": "Step 1/2 : FROM python:3.9\n"},
+    {"stream": " ---> café ☕\n"},
+    {"status": "Downloading", "progressDetail": {"current": 1, "total": 2}},
+]
+
+
+def parse(chunks):
+    parser = BuildStreamParser()
+    records = [record for chunk in chunks for record in parser.feed(chunk)]
+    parser.close()
+    return records
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 10_000])
+def test_records_split_across_chunks(size):
+    assert parse(split_every(json_lines(RECORDS), size)) == RECORDS
+
+
+def test_records_without_separators():
+    assert parse([b"".join(json.dumps(r).encode() for r in RECORDS)]) == RECORDS
+
+
+def test_multi_byte_characters_split_across_chunks():
+    data = json_lines([{"stream": "☕"}])
+    cut = data.index("☕".encode()) + 1
+    assert parse([data[:cut], data[cut:]]) == [{"stream": "☕"}]
+
+
+def test_records_are_yielded_as_soon_as_complete():
+    parser = BuildStreamParser()
+    data = json_lines(RECORDS[:2])
+    first_end = data.index(b"}") + 1
+    assert list(parser.feed(data[:first_end - 1])) == []
+    assert list(parser.feed(data[first_end - 1:first_end + 3])) == [RECORDS[0]]
+    assert list(parser.feed(data[first_end + 3:])) == [RECORDS[1]]
+    parser.close()
+
+
+def test_output_ending_mid_record():
+    parser = BuildStreamParser()
+    assert list(parser.feed(b'{"stream": "Step 1/2"}{"stream": "Ste')) == [{"stream": "Step 1/2"}]
+    with pytest.raises(ImageBuildFailed, match="mid-message"):
+        parser.close()
+
+
+class FakeDockerClient:
+    """Stands in for docker-py's APIClient, streaming back `chunks` for every build."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.builds = []
+
+    def build(self, fileobj, custom_context, tag, dockerfile, rm, cache_from=None):
+        self.builds.append({"tag": tag, "cache_from": cache_from, "context": fileobj.read()})
+        return iter(self.chunks)
+
+    def inspect_image(self, tag):
+        if not any(build["tag"] == tag for build in self.builds):
+            raise LookupError(tag)
+        return {}
+
+
+@pytest.fixture
+def project(tmp_path):
+    config = Config()
+    path_map = config.absolute_paths(tmp_path)
+    path_map.service_dir("api").mkdir(parents=True)
+    (path_map.service_dir("api") / "main.py").write_text("app = None\n")
+    (tmp_path / CloudRunSettings.dockerfile).write_text("FROM python:3.9\n")
+    return path_map, Graph(nodes={"api"}, edges=set())
+
+
+def builder_for(project, chunks):
+    path_map, graph = project
+    client = FakeDockerClient(chunks)
+    return ImageBuilder(client, path_map, graph), client
+
+
+def test_build_logs_split_output_and_skips_unchanged_builds(project):
+    builder, client = builder_for(project, split_every(json_lines(RECORDS), 5))
+    assert builder.build("api") is True
+    assert client.builds[0]["tag"] == "gcr.io/query-router/api"
+    assert client.builds[0]["cache_from"] == ["gcr.io/query-router/api"]
+    assert builder.build("api") is False
+    assert builder.build("api", force=True) is True
+    assert len(client.builds) == 2
+
+
+def test_build_fails_on_error_records(project):
+    records = [*RECORDS, {"error": "boom", "errorDetail": {"message": "The command returned a non-zero code: 1\n"}}]
+    builder, client = builder_for(project, split_every(json_lines(records), 4))
+    with pytest.raises(ImageBuildFailed, match="non-zero code: 1"):
+        builder.build("api")
+    assert builder.state.get("api") is None
+
+
+def test_build_many_collects_errors(project):
+    builder, _ = builder_for(project, [json_lines([{"errorDetail": {"message": "boom"}}])])
+    errors = builder.build_many(["api"])
+    assert isinstance(errors["api"], ImageBuildFailed)
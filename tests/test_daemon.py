@@ -0,0 +1,22 @@
+import pytest
+from yoyo.daemon import client_command
+
+
+@pytest.mark.parametrize("argv, command", [
+    (["up"], "up"),
+    (["up", "--build-workers", "4"], "up"),
+    (["up", "--build_workers=4"], "up"),
+    (["--find", "a+", "up"], "up"),
+    (["--services=a", "down"], "down"),
+    (["call", "a", "GET", "/users"], "call"),
+    (["status"], "status"),
+    (["up", "--watch"], None),
+    (["up", "--grep", "error"], None),
+    (["--find", "a+", "up", "--watch"], None),
+    (["--target", "cloud_run", "up"], None),
+    (["up", "--help"], None),
+    (["bench"], None),
+    ([], None),
+])
+def test_client_command(argv, command):
+    assert client_command(argv) == command
@@ -0,0 +1,121 @@
+from dataclasses import dataclass
+
+import pytest
+from helpers import json_array, split_every
+from yoyo.decoding import JsonArrayParser, iter_array, parse, parser_for
+
+ITEMS = [1, -2.5, 1e3, "a,]b", "☕", None, True, [], [1, [2]], {"a": {"b": [1, 2]}}, {}]
+
+
+def parse_chunks(chunks):
+    parser = JsonArrayParser()
+    items = [item for chunk in chunks for item in parser.feed(chunk)]
+    return items + list(parser.close())
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 16, 10_000])
+@pytest.mark.parametrize("separator", [",", ", ", "\n ,\t"])
+def test_items_split_across_chunks(size, separator):
+    assert parse_chunks(split_every(json_array(ITEMS, separator), size)) == ITEMS
+
+
+@pytest.mark.parametrize("body", [b"[]", b"  [ ]  ", b"\n[\n]\n"])
+def test_empty_arrays(body):
+    assert parse_chunks([body]) == []
+
+
+def test_numbers_are_not_cut_short_at_a_chunk_boundary():
+    parser = JsonArrayParser()
+    assert list(parser.feed(b"[12")) == []
+    assert list(parser.feed(b"34, 5")) == [1234]
+    assert list(parser.feed(b"6]")) == [56]
+    assert list(parser.close()) == []
+
+
+def test_items_are_yielded_once_followed_by_a_delimiter():
+    parser = JsonArrayParser()
+    assert list(parser.feed(b'[{"a": 1}, "b')) == [{"a": 1}]
+    assert list(parser.feed(b'c"')) == []
+    assert list(parser.feed(b"]")) == ["bc"]
+    assert list(parser.close()) == []
+
+
+@pytest.mark.parametrize("body, message", [
+    (b'{"a": 1}', "Expected a JSON array"),
+    (b"[1 2]", "Expected ',' or ']'"),
+    (b"[1] 2", "Unexpected data after"),
+    (b"[1, 2", "ended early"),
+    (b"", "ended early"),
+])
+def test_invalid_arrays(body, message):
+    with pytest.raises(ValueError, match=message):
+        parse_chunks(split_every(body, 2) or [b""])
+
+
+@dataclass
+class Point:
+    x: int
+    y: int
+
+
+class Validated:
+    """Quacks like a pydantic v2 model, counting how it was built."""
+    validated = constructed = 0
+
+    def __init__(self, **fields):
+        self.fields = fields
+
+    @classmethod
+    def model_validate(cls, obj):
+        cls.validated += 1
+        return cls(**obj)
+
+    @classmethod
+    def model_construct(cls, **fields):
+        cls.constructed += 1
+        return cls(**fields)
+
+
+class Collection:
+    """A `parse_object` class is handed the whole body, list or not."""
+
+    def __init__(self, items):
+        self.items = items
+
+    @classmethod
+    def parse_object(cls, obj):
+        return cls(obj)
+
+
+def test_parser_for_is_worked_out_once_per_class():
+    parser_for.cache_clear()
+    assert parser_for(Validated) is parser_for(Validated)
+    assert parser_for(Validated, trusted=True) is parser_for(Validated, trusted=True)
+    assert parser_for.cache_info().misses == 2
+
+
+def test_parser_for_picks_the_class_constructor():
+    assert parser_for(Point)({"x": 1, "y": 2}) == Point(1, 2)
+    assert parser_for(Collection) == Collection.parse_object
+    assert parser_for(Validated) == Validated.model_validate
+    assert parser_for(Point, trusted=True)({"x": 1, "y": 2}) == Point(1, 2)
+
+
+def test_trusted_parsing_skips_validation():
+    Validated.validated = Validated.constructed = 0
+    assert parse(b'{"a": 1}', Validated, trusted=True).fields == {"a": 1}
+    assert (Validated.validated, Validated.constructed) == (0, 1)
+    parse(b'{"a": 1}', Validated)
+    assert (Validated.validated, Validated.constructed) == (1, 1)
+
+
+def test_parse():
+    assert parse(b'{"x": 1, "y": 2}') == {"x": 1, "y": 2}
+    assert parse(b'[{"x": 1, "y": 2}]', Point) == [Point(1, 2)]
+    assert parse(b"[1, 2]", Collection).items == [1, 2]
+
+
+def test_iter_array_builds_items():
+    chunks = split_every(b'[{"x": 1, "y": 2}, {"x": 3, "y": 4}]', 3)
+    assert list(iter_array(chunks, Point)) == [Point(1, 2), Point(3, 4)]
+    assert list(iter_array(chunks)) == [{"x": 1, "y": 2}, {"x": 3, "y": 4}]
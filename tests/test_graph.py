@@ -0,0 +1,72 @@
+import pytest
+from yoyo.graph import Graph
+
+
+@pytest.fixture
+def chain():
+    """a calls b calls c calls d, and e calls b."""
+    return Graph(nodes={"a", "b", "c", "d", "e"}, edges={("a", "b"), ("b", "c"), ("c", "d"), ("e", "b")})
+
+
+@pytest.mark.parametrize("find_expr, expected", [
+    ("b", {"b"}),
+    ("b+", {"b", "c", "d"}),
+    ("b+1", {"b", "c"}),
+    ("b+2", {"b", "c", "d"}),
+    ("+c", {"a", "b", "c", "e"}),
+    ("1+c", {"b", "c"}),
+    ("2+c", {"a", "b", "c", "e"}),
+    ("1+b+1", {"a", "b", "c", "e"}),
+    ("a d", {"a", "d"}),
+    ("a+ -c", {"a", "b", "d"}),
+    ("a+ -c+", {"a", "b"}),
+    ("+c -e", {"a", "b", "c"}),
+    ("-a a", {"a"}),
+    ("a -a", set()),
+])
+def test_search(chain, find_expr, expected):
+    assert chain.search(find_expr) == expected
+
+
+def test_search_rejects_invalid_terms(chain):
+    with pytest.raises(ValueError):
+        chain.search("a++")
+
+
+def test_search_in_a_cycle_includes_the_service():
+    graph = Graph(nodes={"a", "b"}, edges={("a", "b"), ("b", "a")})
+    assert graph.search("a+") == {"a", "b"}
+    assert graph.search("a+1") == {"a", "b"}
+
+
+def test_waves_start_callees_first(chain):
+    waves, cycles = chain.waves(chain.nodes)
+    assert waves == [["d"], ["c"], ["b"], ["a", "e"]]
+    assert cycles == []
+    assert chain.topological_order(chain.nodes) == ["d", "c", "b", "a", "e"]
+
+
+def test_waves_follow_links_through_unselected_services(chain):
+    waves, _ = chain.waves({"a", "d"})
+    assert waves == [["d"], ["a"]]
+
+
+def test_waves_group_cycles():
+    graph = Graph(
+        nodes={"a", "b", "c", "d", "e"},
+        edges={("a", "b"), ("b", "c"), ("c", "b"), ("c", "d"), ("e", "e")}
+    )
+    waves, cycles = graph.waves(graph.nodes)
+    assert waves == [["d", "e"], ["b", "c"], ["a"]]
+    assert sorted(map(sorted, cycles)) == [["b", "c"], ["e"]]
+
+
+def test_waves_of_nothing():
+    assert Graph(nodes=set(), edges=set()).waves([]) == ([], [])
+
+
+def test_json_round_trip(chain, tmp_path):
+    path = tmp_path / "graph.json"
+    chain.write(path)
+    loaded = Graph.from_json(path)
+    assert (loaded.nodes, loaded.edges, loaded.reachable) == (chain.nodes, chain.edges, chain.reachable)
@@ -0,0 +1,123 @@
+from textwrap import dedent
+
+import pytest
+from yoyo.link_extraction import extract_links, extract_links_many, execute_links
+
+
+def links(tmp_path, source: str, name: str = "links.py"):
+    links_file = tmp_path / name
+    links_file.write_text(dedent(source))
+    return links_file
+
+
+@pytest.mark.parametrize("source, expected", [
+    ("""
+     from yoyo.service import Service
+     users = Service("users")
+     orders: Service = Service(name="orders")
+     """, {"users", "orders"}),
+    ("""
+     from yoyo.service import Service as S
+     users = S("users")
+     """, {"users"}),
+    ("""
+     from yoyo.service import *
+     users = Service("users")
+     """, {"users"}),
+    ("""
+     import yoyo.service
+     users = yoyo.service.Service("users")
+     """, {"users"}),
+    ("""
+     import yoyo.service as svc
+     users = svc.Service("users")
+     """, {"users"}),
+    ("""
+     from yoyo import service
+     users = service.Service("users")
+     """, {"users"}),
+    ("""
+     \"\"\"Docstring.\"\"\"
+     from __future__ import annotations
+     from typing import TYPE_CHECKING
+     from yoyo.service import Service
+     if TYPE_CHECKING:
+         pass
+     users = Service("users")
+     same_users = users
+     TIMEOUT = 5
+     """, {"users"}),
+    ("""
+     from yoyo.service import Service
+     users = Service("users")
+     users = 1
+     """, set()),
+    ("""
+     from yoyo.service import Service
+     def users():
+         return Service("users")
+     """, set()),
+])
+def test_extracts_statically_bound_services(tmp_path, source, expected):
+    assert extract_links(links(tmp_path, source)) == expected
+
+
+@pytest.mark.parametrize("source", [
+    """
+    from yoyo.service import Service
+    services = [Service(name) for name in ("users", "orders")]
+    """,
+    """
+    from yoyo.service import Service
+    for name in ("users", "orders"):
+        globals()[name] = Service(name)
+    """,
+    """
+    from yoyo.service import Service
+    NAME = "users"
+    users = Service(NAME)
+    """,
+    """
+    from yoyo.service import Service
+    a, b = Service("users"), Service("orders")
+    """,
+    """
+    from .helpers import users
+    """,
+    """
+    from helpers import make_service
+    users = make_service("users")
+    """,
+    """
+    from yoyo.service import Service
+    try:
+        users = Service("users")
+    except ImportError:
+        pass
+    """,
+    "def broken(:\n",
+])
+def test_unresolvable_links_fall_back_to_execution(tmp_path, source):
+    assert extract_links(links(tmp_path, source)) is None
+
+
+def test_missing_links_file_has_no_links(tmp_path):
+    assert extract_links(tmp_path / "links.py") == set()
+
+
+def test_extract_many(tmp_path):
+    files = {
+        "a": links(tmp_path, 'from yoyo.service import Service\nb = Service("b")\n', "a.py"),
+        "b": links(tmp_path, 'from helpers import users\n', "b.py"),
+        "c": tmp_path / "missing.py",
+    }
+    assert extract_links_many(files) == {"a": {"b"}, "b": None, "c": set()}
+
+
+def test_matches_execution(tmp_path):
+    links_file = links(tmp_path, """
+        from yoyo.service import Service
+        users = Service("users")
+        orders: Service = Service(name="orders")
+        """)
+    assert extract_links(links_file) == execute_links(tmp_path, links_file)
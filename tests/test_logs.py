@@ -0,0 +1,77 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+from yoyo import logs
+from yoyo.config import LogSettings
+from yoyo.logs import RESET, _Stream
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(logs.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def stream_for():
+    files = []
+
+    def stream_for(**settings):
+        read, write = os.pipe()
+        os.close(write)
+        files.append(os.fdopen(read, 'rb'))
+        return _Stream("api", SimpleNamespace(stdout=files[-1]), b"[api] ", LogSettings(**settings), None, "api")
+
+    yield stream_for
+    for f in files:
+        f.close()
+
+
+def emitted(stream, data: bytes):
+    out = []
+    stream.feed(data, out)
+    return [line[len(b"[api] "):-len(RESET + b"\n")] for line in out]
+
+
+def test_lines_are_split_across_chunks(stream_for):
+    stream = stream_for()
+    assert emitted(stream, b"one\ntw") == [b"one"]
+    assert emitted(stream, b"o\r\nthree\n") == [b"two", b"three"]
+
+
+def test_rate_limit_drops_lines_over_the_burst(stream_for, clock):
+    stream = stream_for(rate_limit=2)
+    assert emitted(stream, b"1\n2\n3\n4\n") == [b"1", b"2"]
+    assert stream.dropped == 2
+    clock.now += 0.5
+    assert emitted(stream, b"5\n6\n") == [b"5"]
+    clock.now += 10
+    assert emitted(stream, b"7\n8\n9\n") == [b"7", b"8"]
+
+
+def test_rate_limit_under_one_line_a_second(stream_for, clock):
+    stream = stream_for(rate_limit=0.5)
+    assert emitted(stream, b"1\n2\n") == [b"1"]
+    clock.now += 1
+    assert emitted(stream, b"3\n") == []
+    clock.now += 1
+    assert emitted(stream, b"4\n") == [b"4"]
+    clock.now += 60
+    assert emitted(stream, b"5\n6\n") == [b"5"]
+    assert stream.dropped == 3
+
+
+def test_filtered_lines_are_not_rate_limited(stream_for, clock):
+    stream = stream_for(rate_limit=1, grep="error")
+    assert emitted(stream, b"info\nerror: a\ninfo\n") == [b"error: a"]
+    assert stream.dropped == 0
@@ -0,0 +1,77 @@
+import re
+
+from yoyo.metrics import CallMetrics, Histogram
+
+SAMPLE = re.compile(r'^(?P<name>[a-z_]+)\{(?P<labels>.*)\} (?P<value>\S+)$')
+HISTOGRAM_SUFFIXES = ("_bucket", "_sum", "_count")
+
+
+def family(name: str, types: dict) -> str:
+    for suffix in HISTOGRAM_SUFFIXES:
+        if name.endswith(suffix) and types.get(name[:-len(suffix)]) == "histogram":
+            return name[:-len(suffix)]
+    return name
+
+
+def exposition_families(text: str):
+    """Families in the order their groups appear, asserting each is one group led by its TYPE line."""
+    types, order = {}, []
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            name, kind = line.split()[2:]
+            assert name not in types, f"second TYPE line for {name}"
+            types[name] = kind
+            order.append(name)
+            continue
+        sample = SAMPLE.match(line)
+        assert sample, line
+        assert family(sample['name'], types) == order[-1], f"{line!r} is outside the {order[-1]} group"
+    return order
+
+
+def metrics_with_two_edges():
+    metrics = CallMetrics(caller="a")
+    metrics.record("b", "get", "/users?id=1", 0.003, "200", 10, 100, reused=False)
+    metrics.record("b", "get", "/users", 0.2, "500", 10, 5, reused=True)
+    metrics.record("c", "post", "/orders", 0.02, "201", 50, 20, reused=True)
+    return metrics
+
+
+def test_prometheus_groups_each_family():
+    text = metrics_with_two_edges().prometheus()
+    assert exposition_families(text) == [
+        "yoyo_call_duration_seconds", "yoyo_call_request_bytes_total", "yoyo_call_response_bytes_total",
+        "yoyo_call_responses_total", "yoyo_call_connections_total",
+    ]
+
+
+def test_prometheus_samples():
+    lines = metrics_with_two_edges().prometheus().splitlines()
+    b = 'caller="a",callee="b",method="GET",path="/users"'
+    c = 'caller="a",callee="c",method="POST",path="/orders"'
+    assert f'yoyo_call_duration_seconds_bucket{{{b},le="0.005"}} 1' in lines
+    assert f'yoyo_call_duration_seconds_bucket{{{b},le="+Inf"}} 2' in lines
+    assert f"yoyo_call_duration_seconds_count{{{c}}} 1" in lines
+    assert f"yoyo_call_request_bytes_total{{{b}}} 20" in lines
+    assert f"yoyo_call_response_bytes_total{{{c}}} 20" in lines
+    assert f'yoyo_call_responses_total{{{b},status="500"}} 1' in lines
+    assert f'yoyo_call_connections_total{{{b},reused="false"}} 1' in lines
+    assert f'yoyo_call_connections_total{{{c},reused="true"}} 1' in lines
+
+
+def test_prometheus_without_calls():
+    assert len(exposition_families(CallMetrics(caller="a").prometheus())) == 5
+
+
+def test_labels_are_escaped():
+    metrics = CallMetrics(caller="a")
+    metrics.record("b", "get", '/say/"hi"\\', 0.01, "200")
+    assert 'path="/say/\\"hi\\"\\\\"' in metrics.prometheus()
+
+
+def test_histogram_quantile():
+    histogram = Histogram()
+    for _ in range(100):
+        histogram.observe(0.003)
+    assert 0.0025 < histogram.quantile(0.5) <= 0.005
+    assert Histogram().quantile(0.5) is None
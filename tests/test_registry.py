@@ -0,0 +1,34 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from yoyo.registry import ServiceRegistry, replica_name, service_of
+
+
+def test_concurrent_changes_are_not_lost(tmp_path):
+    registry = ServiceRegistry(tmp_path / "registry.json")
+    registry.register("api", 8000, os.getpid())
+    names = [replica_name("worker", i, 50) for i in range(50)]
+
+    def change(name):
+        registry.register(name, 9000, os.getpid(), "worker")
+        registry.update("api", restarts=1)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(change, names))
+    assert set(registry.read()) == {"api", *names}
+    assert registry.read()["api"]["restarts"] == 1
+
+
+def test_unregister(tmp_path):
+    registry = ServiceRegistry(tmp_path / "registry.json")
+    registry.register("api", 8000, os.getpid())
+    registry.unregister("api")
+    registry.unregister("missing")
+    assert registry.read() == {}
+
+
+def test_replica_names():
+    assert replica_name("api", 0, 1) == "api"
+    assert [replica_name("api", i, 2) for i in range(2)] == ["api#1", "api#2"]
+    assert service_of("api#2") == "api"
+    assert service_of("x", {"service": "api"}) == "api"
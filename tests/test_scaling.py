@@ -0,0 +1,70 @@
+import pytest
+from yoyo.config import ScalingSettings
+from yoyo.ports import PortAllocator
+from yoyo.targets.local import stack
+from yoyo.targets.local.stack import Scale
+
+
+@pytest.fixture(autouse=True)
+def cores(monkeypatch):
+    monkeypatch.setattr(stack, "available_cores", lambda: 8)
+
+
+@pytest.mark.parametrize("scaling, expected", [
+    ({}, Scale(1, 1)),
+    ({"replicas": 3}, Scale(3, 1)),
+    ({"workers": "auto"}, Scale(1, 8)),
+    ({"replicas": "auto"}, Scale(8, 1)),
+    ({"replicas": "auto", "workers": "auto"}, Scale(1, 8)),
+    ({"replicas": 3, "workers": "auto"}, Scale(3, 2)),
+    ({"replicas": "auto", "workers": 3}, Scale(2, 3)),
+    ({"replicas": 16, "workers": "auto"}, Scale(16, 1)),
+    ({"services": {"api": {"replicas": 2}}}, Scale(2, 1)),
+    ({"replicas": 4, "services": {"api": {"replicas": 1}}}, Scale(1, 1)),
+])
+def test_scale_for_service(scaling, expected):
+    assert Scale.for_service(ScalingSettings.from_dict(scaling), "api") == expected
+
+
+@pytest.mark.parametrize("scaling, message", [
+    ({"replicas": 0}, "scaling.replicas must be"),
+    ({"workers": "many"}, "scaling.workers must be"),
+    ({"replicas": True}, "scaling.replicas must be"),
+    ({"services": {"api": {"workers": 1.5}}}, "scaling.services.api.workers must be"),
+    ({"services": {"api": {"replica": 2}}}, "Unknown setting"),
+])
+def test_invalid_scaling_is_rejected_on_load(scaling, message):
+    with pytest.raises(ValueError, match=message):
+        ScalingSettings.from_dict(scaling)
+
+
+def test_replica_names():
+    assert Scale(1, 4).names("api") == ["api"]
+    assert Scale(3, 1).names("api") == ["api#1", "api#2", "api#3"]
+
+
+def test_every_replica_gets_its_own_port(tmp_path):
+    names = Scale(3, 1).names("api") + Scale(1, 1).names("web")
+    allocator = PortAllocator(tmp_path / "ports.json", host="127.0.0.1")
+    try:
+        ports = allocator.reserve(names)
+        assert sorted(ports) == sorted(names)
+        assert len(set(ports.values())) == 4
+        assert all(allocator.socket(name).getsockname()[1] == port for name, port in ports.items())
+    finally:
+        allocator.close()
+    reused = PortAllocator(tmp_path / "ports.json", host="127.0.0.1")
+    try:
+        assert reused.reserve(names) == ports
+    finally:
+        reused.close()
+
+
+def test_released_replica_ports(tmp_path):
+    allocator = PortAllocator(tmp_path / "ports.json", host="127.0.0.1")
+    try:
+        allocator.reserve(["api#1", "api#2"])
+        allocator.release("api#2")
+        assert set(allocator.sockets) == {"api#1"}
+    finally:
+        allocator.close()
@@ -0,0 +1,36 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from yoyo.state import JsonState, read_json, write_json
+from yoyo.targets.cloud_run.builds import ImageState
+from yoyo.venvs import VirtualenvState
+
+
+def test_write_replaces_the_whole_file(tmp_path):
+    path = tmp_path / "generated" / "state.json"
+    write_json(path, {"a": 1})
+    write_json(path, {"b": 2})
+    assert read_json(path) == {"b": 2}
+    assert [p.name for p in path.parent.iterdir()] == ["state.json"]
+
+
+def test_missing_or_partial_files_read_empty(tmp_path):
+    assert read_json(tmp_path / "missing.json") == {}
+    (tmp_path / "partial.json").write_text('{"a": ')
+    assert read_json(tmp_path / "partial.json") == {}
+
+
+def test_concurrent_records_are_kept(tmp_path):
+    state = JsonState(tmp_path / "state.json")
+    services = [f"s{i}" for i in range(50)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda s: state.set(s, {"n": s}), services))
+    assert state.read() == {s: {"n": s} for s in services}
+
+
+def test_records(tmp_path):
+    venvs, images = VirtualenvState(tmp_path / "venvs.json"), ImageState(tmp_path / "images.json")
+    venvs.record("api", "abc", tmp_path / ".venv")
+    images.record("api", "gcr.io/x/api", "def")
+    assert venvs.get("api") == {"fingerprint": "abc", "virtualenv": str(tmp_path / ".venv")}
+    assert images.get("api") == {"tag": "gcr.io/x/api", "context": "def"}
+    assert images.get("web") is None
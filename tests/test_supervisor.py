@@ -0,0 +1,70 @@
+import os
+from pathlib import Path
+
+import pytest
+from yoyo import supervisor
+
+
+@pytest.fixture
+def cgroup_root(tmp_path, monkeypatch):
+    """A stand-in for our own cgroup v2 group, with the memory controller available."""
+    if "0::/\n" not in Path("/proc/self/cgroup").read_text():
+        pytest.skip("Not in the root of a cgroup v2 hierarchy.")
+    monkeypatch.setattr(supervisor, "CGROUP_ROOT", tmp_path)
+    supervisor.cgroup_parent.cache_clear()
+    (tmp_path / "cgroup.controllers").write_text("cpu memory pids\n")
+    (tmp_path / "cgroup.procs").write_text(f"{os.getpid()}\n")
+    (tmp_path / "cgroup.subtree_control").write_text("")
+    yield tmp_path
+    supervisor.cgroup_parent.cache_clear()
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    written = []
+    write_text = Path.write_text
+
+    def record(path, text, *args, **kwargs):
+        written.append((path, text))
+        return write_text(path, text, *args, **kwargs)
+
+    monkeypatch.setattr(Path, "write_text", record)
+    return written
+
+
+def test_moves_into_a_leaf_and_enables_memory(cgroup_root, writes):
+    assert supervisor.cgroup_parent() == cgroup_root
+    assert writes == [
+        (cgroup_root / "yoyo" / "cgroup.procs", str(os.getpid())),
+        (cgroup_root / "cgroup.subtree_control", "+memory"),
+    ]
+
+
+def test_not_moved_when_sharing_the_group(cgroup_root, writes):
+    (cgroup_root / "cgroup.procs").write_text(f"1\n{os.getpid()}\n")
+    writes.clear()
+    assert supervisor.cgroup_parent() is None
+    assert writes == []
+    assert not (cgroup_root / "yoyo").exists()
+
+
+def test_moved_back_when_memory_cant_be_enabled(cgroup_root, writes):
+    (cgroup_root / "cgroup.subtree_control").unlink()
+    (cgroup_root / "cgroup.subtree_control").mkdir()
+    assert supervisor.cgroup_parent() is None
+    assert writes == [
+        (cgroup_root / "yoyo" / "cgroup.procs", str(os.getpid())),
+        (cgroup_root / "cgroup.subtree_control", "+memory"),
+        (cgroup_root / "cgroup.procs", str(os.getpid())),
+    ]
+
+
+def test_no_cgroup_without_the_memory_controller(cgroup_root):
+    (cgroup_root / "cgroup.controllers").write_text("cpu pids\n")
+    assert supervisor.memory_cgroup("api", 64 * supervisor.MB) is None
+
+
+def test_memory_cgroup(cgroup_root):
+    group = supervisor.memory_cgroup("api", 64 * supervisor.MB)
+    assert group == cgroup_root / "yoyo-api"
+    assert (group / "memory.max").read_text() == str(64 * supervisor.MB)
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import csv
+import errno
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+ARTIFACT_STORE_ENV_VAR = "YOYO_ARTIFACT_STORE"
+PYTHON_PLACEHOLDER = b"#!__yoyo_python__"
+
+Dist = Tuple[str, str]
+
+
+@dataclass(frozen=True, eq=True)
+class ArtifactStore:
+    """
+    Content-addressed store of installed distributions shared by every service virtualenv.
+
+    Files are kept once under `objects/` by sha256 and hard linked into venvs, each installed distribution has a
+    manifest under `dists/` so a new venv can be populated without downloading or unpacking anything.
+    """
+    root: Path
+
+    @classmethod
+    def from_env(cls) -> ArtifactStore:
+        default = Path(os.getenv("XDG_CACHE_HOME", Path.home() / ".cache")) / "yoyo"
+        return cls(Path(os.getenv(ARTIFACT_STORE_ENV_VAR, default)))
+
+    @property
+    def objects_dir(self) -> Path:
+        return self.root / "objects"
+
+    @property
+    def cache_dir(self) -> Path:
+        return self.root / "cache"
+
+    def dists_dir(self, python: str) -> Path:
+        return self.root / "dists" / python
+
+    def manifest_file(self, python: str, dist: Dist) -> Path:
+        name, version = dist
+        return self.dists_dir(python) / f"{name}-{version}.json"
+
+    def to_env(self, process_env):
+        """Share poetry's and pip's download caches between every service."""
+        process_env.setdefault("POETRY_CACHE_DIR", str(self.cache_dir / "poetry"))
+        process_env.setdefault("PIP_CACHE_DIR", str(self.cache_dir / "pip"))
+
+    def seed(self, virtualenv_dir: Path, dists: Set[Dist]) -> int:
+        """Link every locked distribution already in the store into the venv, returns how many were linked."""
+        site_packages = find_site_packages(virtualenv_dir)
+        python = python_tag(site_packages)
+        if python is None:
+            return 0
+        installed = set(installed_dists(site_packages))
+        seeded = 0
+        for dist in dists - installed:
+            try:
+                manifest = json.loads(self.manifest_file(python, dist).read_text())
+            except FileNotFoundError:
+                continue
+            for rel_path, digest in manifest['files'].items():
+                self._materialise(digest, site_packages / rel_path)
+            for rel_path, digest in manifest['scripts'].items():
+                self._materialise_script(digest, site_packages / rel_path, virtualenv_dir)
+            seeded += 1
+        return seeded
+
+    def add(self, virtualenv_dir: Path):
+        """Move the venv's distributions into the store, replacing their files with hard links to it."""
+        site_packages = find_site_packages(virtualenv_dir)
+        python = python_tag(site_packages)
+        if python is None:
+            return
+        for dist, dist_info in installed_dists(site_packages).items():
+            manifest_file = self.manifest_file(python, dist)
+            if manifest_file.exists() or (dist_info / "direct_url.json").exists():
+                continue
+            manifest = {"files": {}, "scripts": {}}
+            for path in record_files(dist_info):
+                rel_path = os.path.relpath(path, site_packages)
+                if not path.is_file():
+                    continue
+                if rel_path.startswith(os.pardir):
+                    manifest['scripts'][rel_path] = self._store_script(path, virtualenv_dir)
+                else:
+                    manifest['files'][rel_path] = self._store(path)
+            manifest_file.parent.mkdir(exist_ok=True, parents=True)
+            write_atomic(manifest_file, json.dumps(manifest).encode())
+
+    def _object(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest
+
+    def _store(self, path: Path) -> str:
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()
+        obj = self._object(digest)
+        if not obj.exists():
+            obj.parent.mkdir(exist_ok=True, parents=True)
+            try:
+                os.link(path, obj)
+                return digest
+            except FileExistsError:
+                # Stored by a concurrent build since, and possibly linked into venvs already, so never overwritten.
+                pass
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                copy_atomic(path, obj)
+                return digest
+        if not os.path.samefile(obj, path):
+            link_or_copy(obj, path, copy=False)
+        return digest
+
+    def _store_script(self, path: Path, virtualenv_dir: Path) -> str:
+        """Scripts embed the venv's interpreter in their shebang, so are stored with a placeholder instead."""
+        content = path.read_bytes()
+        shebang = f"#!{virtualenv_dir}/bin/python".encode()
+        if content.startswith(shebang):
+            content = PYTHON_PLACEHOLDER + content[len(shebang):]
+        digest = hashlib.sha256(content).hexdigest()
+        obj = self._object(digest)
+        if not obj.exists():
+            obj.parent.mkdir(exist_ok=True, parents=True)
+            write_atomic(obj, content)
+        return digest
+
+    def _materialise(self, digest: str, path: Path):
+        path.parent.mkdir(exist_ok=True, parents=True)
+        link_or_copy(self._object(digest), path)
+
+    def _materialise_script(self, digest: str, path: Path, virtualenv_dir: Path):
+        content = self._object(digest).read_bytes()
+        if content.startswith(PYTHON_PLACEHOLDER):
+            content = f"#!{virtualenv_dir}/bin/python".encode() + content[len(PYTHON_PLACEHOLDER):]
+        path = Path(os.path.normpath(path))
+        path.parent.mkdir(exist_ok=True, parents=True)
+        write_atomic(path, content)
+        path.chmod(0o755)
+
+
+def find_site_packages(virtualenv_dir: Path) -> Optional[Path]:
+    return next(iter(sorted(virtualenv_dir.glob("lib/python*/site-packages"))), None)
+
+
+def python_tag(site_packages: Optional[Path]) -> Optional[str]:
+    return site_packages.parent.name if site_packages is not None else None
+
+
+def normalise_name(name: str) -> str:
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def installed_dists(site_packages: Path) -> Dict[Dist, Path]:
+    dists = {}
+    for dist_info in site_packages.glob("*.dist-info"):
+        name, _, version = dist_info.name[:-len(".dist-info")].partition('-')
+        dists[(normalise_name(name), version)] = dist_info
+    return dists
+
+
+def record_files(dist_info: Path) -> Iterator[Path]:
+    try:
+        with (dist_info / "RECORD").open(newline='') as record:
+            for row in csv.reader(record):
+                if row:
+                    yield Path(os.path.normpath(dist_info.parent / row[0]))
+    except FileNotFoundError:
+        return
+
+
+def locked_dists(lock_file: Path) -> Set[Dist]:
+    """Required (name, version) pairs pinned in a poetry.lock."""
+    try:
+        text = lock_file.read_text()
+    except FileNotFoundError:
+        return set()
+    dists = set()
+    for block in re.split(r"^\[\[package\]\]\s*$", text, flags=re.MULTILINE)[1:]:
+        name = re.search(r'^name = "(.+)"$', block, flags=re.MULTILINE)
+        version = re.search(r'^version = "(.+)"$', block, flags=re.MULTILINE)
+        if name and version and not re.search(r"^optional = true$", block, flags=re.MULTILINE):
+            dists.add((normalise_name(name.group(1)), version.group(1)))
+    return dists
+
+
+def link_or_copy(source: Path, dest: Path, copy=True):
+    """
+    Atomically replace `dest` with a hard link to `source`.
+    If they're on different filesystems `dest` is a copy instead, or left alone if `copy` is false.
+    """
+    tmp = tmp_path(dest)
+    try:
+        os.link(source, tmp)
+    except OSError:
+        if not copy:
+            return
+        shutil.copy2(source, tmp)
+    os.replace(tmp, dest)
+
+
+def copy_atomic(source: Path, dest: Path):
+    tmp = tmp_path(dest)
+    shutil.copy2(source, tmp)
+    os.replace(tmp, dest)
+
+
+def write_atomic(path: Path, content: bytes):
+    tmp = tmp_path(path)
+    tmp.write_bytes(content)
+    os.replace(tmp, path)
+
+
+def tmp_path(path: Path) -> Path:
+    """A sibling to write before replacing `path`, unique to the thread as venvs are built concurrently."""
+    return path.with_name(f".{path.name}.{os.getpid()}-{threading.get_ident()}.yoyo-tmp")
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+from loguru import logger
+from yoyo.exceptions import ServiceNotFound
+
+LB_STRATEGY_ENV_VAR = "YOYO_LB_STRATEGY"
+LB_EJECT_AFTER_ENV_VAR = "YOYO_LB_EJECT_AFTER"
+LB_EJECT_SECONDS_ENV_VAR = "YOYO_LB_EJECT_SECONDS"
+
+ROUND_ROBIN = "round_robin"
+LEAST_OUTSTANDING = "least_outstanding"
+MAX_EJECT_SECONDS = 120
+
+
+@dataclass(frozen=True, eq=True)
+class BalancerSettings:
+    strategy: str = LEAST_OUTSTANDING
+    eject_after: int = 5
+    eject_seconds: float = 5.0
+
+    @classmethod
+    def from_env(cls):
+        settings = cls(
+            strategy=os.getenv(LB_STRATEGY_ENV_VAR, cls.strategy),
+            eject_after=int(os.getenv(LB_EJECT_AFTER_ENV_VAR, cls.eject_after)),
+            eject_seconds=float(os.getenv(LB_EJECT_SECONDS_ENV_VAR, cls.eject_seconds)),
+        )
+        if settings.strategy not in (ROUND_ROBIN, LEAST_OUTSTANDING):
+            raise ValueError(f"Unknown load balancing strategy '{settings.strategy}'.")
+        return settings
+
+
+settings = BalancerSettings.from_env()
+
+
+@dataclass(eq=False)
+class Instance:
+    url: str
+    outstanding: int = 0
+    failures: int = 0
+    ejections: int = 0
+    ejected_until: float = 0.0
+
+
+class LoadBalancer:
+    """
+    Spreads the calls to one service across its discovered instances, round robin or to whichever has the fewest
+    calls in flight. An instance refusing connections, or failing `eject_after` calls in a row, is left out for a
+    while that doubles with each ejection. If every instance is ejected, the one due back soonest is used anyway.
+    """
+
+    def __init__(self, service: str, settings: BalancerSettings = settings):
+        self.service = service
+        self.settings = settings
+        self.instances: Dict[str, Instance] = {}
+        self._urls: Tuple[str, ...] = ()
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def update(self, urls: Sequence[str]):
+        """Track the instances just discovered, keeping what is known about those already tracked."""
+        urls = tuple(urls)
+        with self._lock:
+            if urls == self._urls:
+                return
+            added = set(urls) - set(self.instances)
+            self.instances = {url: self.instances.get(url) or Instance(url) for url in urls}
+            self._urls = urls
+        if added and len(urls) > 1:
+            logger.debug(f"Balancing '{self.service}' across {len(urls)} instances: {', '.join(urls)}")
+
+    @contextmanager
+    def use(self, urls: Optional[Sequence[str]] = None) -> Iterator[Instance]:
+        """Pick an instance for a call, counting the call as outstanding on it until the block exits."""
+        if urls is not None:
+            self.update(urls)
+        with self._lock:
+            instance = self._pick()
+            instance.outstanding += 1
+        try:
+            yield instance
+        finally:
+            with self._lock:
+                instance.outstanding -= 1
+
+    def pick(self) -> Instance:
+        with self._lock:
+            return self._pick()
+
+    def _pick(self) -> Instance:
+        if not self.instances:
+            raise ServiceNotFound(f"No instances of '{self.service}' discovered.")
+        now = time.monotonic()
+        instances = [i for i in self.instances.values() if i.ejected_until <= now]
+        if not instances:
+            instances = [min(self.instances.values(), key=lambda i: i.ejected_until)]
+        start, self._next = self._next % len(instances), self._next + 1
+        rotated = instances[start:] + instances[:start]
+        if self.settings.strategy == LEAST_OUTSTANDING:
+            # min keeps the first of equals, so the rotation spreads calls across idle instances.
+            return min(rotated, key=lambda i: i.outstanding)
+        return rotated[0]
+
+    def report(self, instance: Instance, ok: bool):
+        """Outcome of a call that got a response, `ok` unless it was a server error."""
+        with self._lock:
+            if ok:
+                instance.failures = instance.ejections = 0
+                return
+            instance.failures += 1
+            failing = instance.failures >= self.settings.eject_after
+        if failing:
+            self.eject(instance)
+
+    def eject(self, instance: Instance):
+        with self._lock:
+            instance.failures = 0
+            instance.ejections += 1
+            seconds = min(self.settings.eject_seconds * 2 ** (instance.ejections - 1), MAX_EJECT_SECONDS)
+            instance.ejected_until = time.monotonic() + seconds
+            others = len(self.instances) - 1
+        if others:
+            logger.warning(f"⏏️ Ejected '{self.service}' instance at {instance.url} for {seconds:g}s.")
+
+
+_lock = threading.Lock()
+_balancers: Dict[Tuple[str, str], LoadBalancer] = {}
+
+
+def balancer_for(target: str, service: str) -> LoadBalancer:
+    """Balancer shared by every caller of the service at the target in this process."""
+    with _lock:
+        if (balancer := _balancers.get((target, service))) is None:
+            balancer = _balancers[(target, service)] = LoadBalancer(service)
+        return balancer
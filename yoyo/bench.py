@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import math
+import time
+from array import array
+from collections import Counter
+from dataclasses import asdict, dataclass, field, fields
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+from urllib.parse import urljoin
+
+from loguru import logger
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+@dataclass
+class BenchSpec:
+    service: str
+    method: str
+    path: str
+    args: Optional[dict] = None
+    concurrency: int = 10
+    rate: Optional[float] = None
+    duration: float = 10
+    warmup: float = 1
+    name: Optional[str] = None
+
+    def __post_init__(self):
+        self.method = self.method.upper()
+        self.name = self.name or f"{self.service}-{self.method.lower()}-{self.path.strip('/').replace('/', '-')}"
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(**{f.name: d[f.name] for f in fields(cls) if f.name in d})
+
+
+def load_specs(path: Path) -> List[BenchSpec]:
+    """
+    Benchmarks from a yaml file with a list of `benches`, each a service, method and path plus any other
+    BenchSpec field, and optional `defaults` applied to them all.
+    """
+    from yoyo.config import yaml
+    with path.open() as f:
+        raw = yaml().load(f)
+    defaults = dict(raw.get('defaults', {}))
+    return [BenchSpec.from_dict({**defaults, **dict(bench)}) for bench in raw['benches']]
+
+
+@dataclass
+class Samples:
+    latencies: array = field(default_factory=lambda: array('d'))
+    statuses: Counter = field(default_factory=Counter)
+
+    def add(self, latency: float, status: str):
+        self.latencies.append(latency)
+        self.statuses[status] += 1
+
+
+@dataclass
+class BenchResult:
+    name: str
+    spec: dict
+    started: str
+    elapsed: float
+    requests: int
+    errors: int
+    statuses: Dict[str, int]
+    throughput: float
+    latency_ms: Dict[str, float]
+    corrected_latency_ms: Dict[str, float]
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(**d)
+
+    def save(self, directory: Path) -> Path:
+        directory.mkdir(exist_ok=True, parents=True)
+        path = directory / f"{self.name}-{self.started.replace(':', '')}.json"
+        path.write_text(json.dumps(asdict(self), indent=2))
+        return path
+
+
+async def run(spec: BenchSpec, urls: Sequence[str]) -> BenchResult:
+    """
+    Drive an endpoint for `spec.duration` seconds after a warmup, either closed loop with `concurrency` requests in
+    flight or open loop at a fixed `rate` of requests per second with up to `concurrency` in flight.
+    Requests are sent to each of the service's instances in turn.
+    At a fixed rate latency is measured from when each request was due rather than when it was sent, so stalls count
+    against every request they delay. Closed loop results are corrected for coordinated omission afterwards.
+    """
+    import httpx
+    limits = httpx.Limits(max_connections=spec.concurrency, max_keepalive_connections=spec.concurrency)
+    targets = itertools.cycle([urljoin(url, spec.path) for url in urls])
+    async with httpx.AsyncClient(limits=limits, timeout=None) as client:
+        if spec.warmup:
+            await drive(client, spec, targets, spec.warmup, Samples())
+        samples = Samples()
+        started = datetime.now().isoformat(timespec='seconds')
+        begin = time.perf_counter()
+        await drive(client, spec, targets, spec.duration, samples)
+        elapsed = time.perf_counter() - begin
+    latencies = sorted(samples.latencies)
+    if spec.rate:
+        corrected = latencies
+    else:
+        corrected = correct_coordinated_omission(latencies, percentile(latencies, 50))
+    errors = sum(n for status, n in samples.statuses.items() if not status.startswith(("2", "3")))
+    return BenchResult(
+        name=spec.name, spec=asdict(spec), started=started, elapsed=elapsed, requests=len(latencies),
+        errors=errors, statuses=dict(samples.statuses), throughput=len(latencies) / elapsed,
+        latency_ms=summarise(latencies), corrected_latency_ms=summarise(corrected)
+    )
+
+
+async def drive(client, spec: BenchSpec, targets: Iterator[str], duration: float, samples: Samples):
+    deadline = time.perf_counter() + duration
+
+    async def request(due: float):
+        try:
+            r = await client.request(spec.method, next(targets), json=spec.args)
+            await r.aread()
+            status = str(r.status_code)
+        except Exception as e:
+            status = type(e).__name__
+        samples.add(time.perf_counter() - due, status)
+
+    if not spec.rate:
+        async def worker():
+            while time.perf_counter() < deadline:
+                await request(time.perf_counter())
+
+        await asyncio.gather(*(worker() for _ in range(spec.concurrency)))
+        return
+
+    semaphore, tasks, interval = asyncio.Semaphore(spec.concurrency), set(), 1 / spec.rate
+    start = time.perf_counter()
+
+    async def scheduled(due: float):
+        async with semaphore:
+            await request(due)
+
+    for i in range(math.ceil(duration * spec.rate)):
+        due = start + i * interval
+        if (delay := due - time.perf_counter()) > 0:
+            await asyncio.sleep(delay)
+        task = asyncio.ensure_future(scheduled(due))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+
+
+def correct_coordinated_omission(latencies: List[float], expected_interval: float) -> List[float]:
+    """
+    As HdrHistogram does, add the samples that a stalled closed loop failed to send: a request taking longer than
+    the expected interval also stands for those that would have been sent every interval while it was outstanding.
+    """
+    if not expected_interval:
+        return latencies
+    corrected = list(latencies)
+    for latency in latencies:
+        missing = latency - expected_interval
+        while missing >= expected_interval:
+            corrected.append(missing)
+            missing -= expected_interval
+    return sorted(corrected)
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+
+def summarise(ordered: List[float]) -> Dict[str, float]:
+    summary = {f"p{p:g}": percentile(ordered, p) * 1000 for p in PERCENTILES}
+    summary["mean"] = sum(ordered) / len(ordered) * 1000 if ordered else 0.0
+    summary["max"] = ordered[-1] * 1000 if ordered else 0.0
+    return summary
+
+
+def previous_result(directory: Path, name: str, exclude: Optional[Path] = None) -> Optional[Path]:
+    """The latest saved run of the bench `name`, whose file names are the bench name then the time it started."""
+    runs = sorted(
+        p for p in directory.glob(f"{name}-*.json") if p != exclude and p.stem[len(name) + 1:][:1].isdigit()
+    )
+    return runs[-1] if runs else None
+
+
+def format_results(results: List[BenchResult]) -> str:
+    header = ("BENCH", "REQS", "ERRORS", "REQ/S", *(f"P{p:g} MS" for p in PERCENTILES), "MAX MS", "P99 CO MS")
+    rows = [header] + [
+        (r.name, str(r.requests), str(r.errors), f"{r.throughput:.1f}",
+         *(f"{r.latency_ms[f'p{p:g}']:.2f}" for p in PERCENTILES), f"{r.latency_ms['max']:.2f}",
+         f"{r.corrected_latency_ms['p99']:.2f}")
+        for r in results
+    ]
+    return table(rows)
+
+
+def format_diff(result: BenchResult, baseline: BenchResult) -> str:
+    def change(new: float, old: float) -> str:
+        return f"{(new - old) / old:+.1%}" if old else "-"
+
+    rows = [
+        ("METRIC", "BASELINE", "CURRENT", "CHANGE"),
+        ("req/s", f"{baseline.throughput:.1f}", f"{result.throughput:.1f}",
+         change(result.throughput, baseline.throughput)),
+    ]
+    for key, value in result.latency_ms.items():
+        old = baseline.latency_ms.get(key, 0.0)
+        rows.append((f"{key} ms", f"{old:.2f}", f"{value:.2f}", change(value, old)))
+    return f"{result.name} vs {baseline.started}:\n" + table(rows)
+
+
+def table(rows) -> str:
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows)
+
+
+def bench(specs: List[BenchSpec], discover, results_dir: Path, baseline: Optional[str] = None) -> List[BenchResult]:
+    """
+    Run benchmarks one after another against the instances `discover` finds for their services, saving each result
+    under `results_dir` and comparing it to `baseline`: a result file, or 'last' for the previous run of the same bench.
+    """
+    results = []
+    for spec in specs:
+        urls = discover(spec.service)
+        mode = f"{spec.rate:g} req/s" if spec.rate else f"concurrency {spec.concurrency}"
+        where = urls[0] if len(urls) == 1 else f"{len(urls)} instances"
+        logger.info(f"🏋️ {spec.name}: {spec.method} {spec.path} on {where} for {spec.duration:g}s at {mode}...")
+        result = asyncio.run(run(spec, urls))
+        path = result.save(results_dir)
+        results.append(result)
+        logger.info(f"💾 Saved results to '{path}'.")
+        if baseline:
+            baseline_path = previous_result(results_dir, spec.name, path) if baseline == 'last' else Path(baseline)
+            if baseline_path is None:
+                logger.warning(f"No previous run of '{spec.name}' to compare with.")
+            else:
+                print(format_diff(result, BenchResult.from_dict(json.loads(baseline_path.read_text()))))
+    print(format_results(results))
+    return results
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import fnmatch
+import hashlib
+import os
+import stat as stat_module
+import tarfile
+import tempfile
+import threading
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterator, List, Optional, Tuple
+
+from yoyo.path_mapper import PathMap
+from yoyo.state import read_json, write_json
+
+IGNORED_DIRS = {"__pycache__", ".venv", ".git", ".pytest_cache", ".mypy_cache"}
+DOCKERFILE = "Dockerfile.yoyo"
+SPOOL_SIZE = 16 * 1024 * 1024
+
+ContextFile = Tuple[Path, os.stat_result]
+
+
+class FileHashes:
+    """sha256 of files, persisted and reused while a file's size, mtime and inode are unchanged."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self._hashes: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        if path is not None:
+            self._hashes = read_json(path)
+
+    def digest(self, path: Path, stat: os.stat_result) -> str:
+        key = [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+        cached = self._hashes.get(str(path))
+        if cached is not None and cached[:3] == key:
+            return cached[3]
+        if stat_module.S_ISLNK(stat.st_mode):
+            return hashlib.sha256(b"symlink:" + os.fsencode(os.readlink(path))).hexdigest()
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()
+        with self._lock:
+            self._hashes[str(path)] = key + [digest]
+        return digest
+
+    def save(self):
+        if self.path is None:
+            return
+        with self._lock:
+            hashes = dict(self._hashes)
+        write_json(self.path, hashes, indent=None)
+
+
+@dataclass
+class BuildContext:
+    """
+    The exact files a service is built from: its own sources, the models of the services it calls as its symlinks
+    would resolve them, and the Dockerfile if building an image. Its digest says whether a service changed, and its
+    tar is the minimal, deterministic docker build context.
+    """
+    path_map: PathMap
+    service: str
+    callees: FrozenSet[str]
+    dockerfile: Optional[Path]
+    hashes: FileHashes
+
+    @classmethod
+    def for_service(cls, path_map: PathMap, graph, service: str, dockerfile: Optional[Path] = None,
+                    hashes: Optional[FileHashes] = None) -> BuildContext:
+        callees = frozenset(graph.callees.get(service, ()))
+        return cls(path_map, service, callees, dockerfile, hashes or FileHashes())
+
+    @cached_property
+    def files(self) -> Dict[str, ContextFile]:
+        service_dir = self.path_map.service_dir(self.service)
+        links_dir = self.path_map.links_dir(self.service)
+        files = dict(walk(service_dir, exclude=links_dir))
+        for callee in sorted(self.callees):
+            prefix = links_dir.relative_to(service_dir) / callee
+            files.update((str(prefix / name), file) for name, file in walk(self.path_map.models_dir(callee)))
+        patterns = dockerignore(service_dir)
+        files = {name: file for name, file in files.items() if not is_ignored(name, patterns)}
+        if self.dockerfile is not None:
+            files[DOCKERFILE] = self.dockerfile, self.dockerfile.stat()
+        return dict(sorted(files.items()))
+
+    def digest(self) -> str:
+        digest = hashlib.sha256()
+        for name, (path, stat) in self.files.items():
+            digest.update(f"{name}\0{file_mode(stat):o}\0{self.hashes.digest(path, stat)}\n".encode())
+        return digest.hexdigest()
+
+    def tar(self):
+        """The context as an uncompressed tar with normalised metadata, in a temporary file rewound to the start."""
+        fileobj = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        with tarfile.open(fileobj=fileobj, mode='w', format=tarfile.PAX_FORMAT) as tar:
+            for name, (path, stat) in self.files.items():
+                info = tarfile.TarInfo(name)
+                info.mode, info.mtime = file_mode(stat), 0
+                if stat_module.S_ISLNK(stat.st_mode):
+                    info.type, info.linkname = tarfile.SYMTYPE, os.readlink(path)
+                    tar.addfile(info)
+                    continue
+                info.size = stat.st_size
+                with path.open('rb') as f:
+                    tar.addfile(info, f)
+        fileobj.seek(0)
+        return fileobj
+
+
+def walk(root: Path, exclude: Optional[Path] = None) -> Iterator[Tuple[str, ContextFile]]:
+    """
+    Files under `root` as (relative name, (path, stat)), skipping caches, venvs and the `exclude` dir.
+    Symlinks are kept as links, as docker would send them, rather than followed.
+    """
+    if not root.is_dir():
+        return
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                path = Path(entry.path)
+                if entry.is_symlink():
+                    yield str(path.relative_to(root)), (path, entry.stat(follow_symlinks=False))
+                elif entry.is_dir(follow_symlinks=False):
+                    if entry.name not in IGNORED_DIRS and path != exclude:
+                        stack.append(path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield str(path.relative_to(root)), (path, entry.stat())
+
+
+def dockerignore(context_dir: Path) -> List[str]:
+    try:
+        lines = (context_dir / ".dockerignore").read_text().splitlines()
+    except FileNotFoundError:
+        return []
+    return [line.strip().strip('/') for line in lines if line.strip() and not line.startswith(('#', '!'))]
+
+
+def is_ignored(name: str, patterns: List[str]) -> bool:
+    return any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(name, f"{p}/*") for p in patterns)
+
+
+def file_mode(stat: os.stat_result) -> int:
+    if stat_module.S_ISLNK(stat.st_mode):
+        return 0o777
+    return 0o755 if stat.st_mode & 0o111 else 0o644
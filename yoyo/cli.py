@@ -1,23 +1,25 @@
 from __future__ import annotations
 
+import sys
 from dataclasses import dataclass, field
 from functools import cached_property
 from pathlib import Path
 from typing import Optional, Set
 
 import fire
-import git
 from loguru import logger
 from yoyo.config import Config
+from yoyo.daemon import DaemonClient, client_command, daemon_available
 from yoyo.graph import Graph
 from yoyo.symlinks import ServiceSymlinkManager
 from yoyo.targets.target_handler import TargetHandler
+from yoyo.utils import find_root
 
 
 @dataclass
 class CLI:
     """PoC tool for managing Python Microservices."""
-    root_path: Path = Path(git.Repo('.', search_parent_directories=True).git.rev_parse("--show-toplevel"))
+    root_path: Optional[Path] = None
     config_path: Path = Path('yoyo.yml')
     find: Optional[str] = None
     services: Set[str] = None
@@ -26,6 +28,7 @@ class CLI:
     _target_descriptor: TargetDescriptor = field(init=False)
 
     def __post_init__(self):
+        self.root_path = Path(self.root_path) if self.root_path else find_root()
         self._target_descriptor = TargetHandler.from_str(self.target)
         self._target_descriptor.add_target_commands_to_cli(self)
         self._parse_custom_arg_types()
@@ -60,7 +63,7 @@ class CLI:
 
     @cached_property
     def _graph(self):
-        return Graph.from_code_links(self._absolute_paths)
+        return Graph.load(self._absolute_paths, self._config.graph)
 
     @cached_property
     def _symlink_manager(self):
@@ -84,24 +87,42 @@ class CLI:
         self._graph.describe()
         self._graph.write(self._absolute_paths.graph_file)
 
-    def link_services(self):
-        """Given the graph compiled from code links, materialise the links as symlinks within service directories."""
-        code_links = self._graph.edges
-        symlinks = self._symlink_manager.get_existing_symlinks()
-
-        to_create = code_links - symlinks
-        self._symlink_manager.link_services(to_create)
+    def link_services(self, dry_run: bool = False, force: bool = False):
+        """
+        Given the graph compiled from code links, materialise the links as symlinks within service directories.
+        Use --dry_run to only show what would change and --force to check every link even if the graph hasn't changed.
+        """
+        self._symlink_manager.reconcile(self._graph, dry_run=dry_run, force=force)
 
-        to_delete = symlinks - code_links
-        self._symlink_manager.unlink_services(to_delete)
+    def graph(self, stats: bool = False, reset: bool = False):
+        """
+        Show the links between selected services. With --stats, overlay the call latency, throughput and errors
+        measured on each link by running services, the links taking the most time first. --reset clears them.
+        """
+        metrics_dir = self._absolute_paths.metrics_dir
+        if reset:
+            for snapshot in metrics_dir.glob("*.json"):
+                snapshot.unlink()
+        edges = set((caller, callee) for caller, callee in self._graph.edges if caller in self.services)
+        if not stats:
+            for caller, callee in sorted(edges):
+                logger.info(f"{caller} ➡️ {callee}")
+            return
+        from yoyo.metrics import load_edge_stats, format_edge_stats
+        measured = {edge: s for edge, s in load_edge_stats(metrics_dir).items() if edge[0] in self.services}
+        print(format_edge_stats(edges, measured))
 
     def list(self):
-        for service in self.services:
+        """List selected services, callees before their callers."""
+        for service in self._graph.topological_order(self.services):
             logger.info(service)
 
 
 def main():
-    fire.Fire(CLI)
+    if client_command(sys.argv[1:]) and daemon_available(find_root()):
+        fire.Fire(DaemonClient)
+    else:
+        fire.Fire(CLI)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+import atexit
+import os
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Awaitable, Dict, Optional, TypeVar
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+HTTP_POOL_SIZE_ENV_VAR = "YOYO_HTTP_POOL_SIZE"
+HTTP_CONNECT_TIMEOUT_ENV_VAR = "YOYO_HTTP_CONNECT_TIMEOUT"
+HTTP_READ_TIMEOUT_ENV_VAR = "YOYO_HTTP_READ_TIMEOUT"
+
+CONNECTION_ERRORS = (requests.ConnectionError, httpx.ConnectError)
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True, eq=True)
+class PoolSettings:
+    pool_size: int = 10
+    connect_timeout: float = 5.0
+    read_timeout: float = 60.0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            pool_size=int(os.getenv(HTTP_POOL_SIZE_ENV_VAR, cls.pool_size)),
+            connect_timeout=float(os.getenv(HTTP_CONNECT_TIMEOUT_ENV_VAR, cls.connect_timeout)),
+            read_timeout=float(os.getenv(HTTP_READ_TIMEOUT_ENV_VAR, cls.read_timeout)),
+        )
+
+    @property
+    def timeout(self):
+        return self.connect_timeout, self.read_timeout
+
+
+settings = PoolSettings.from_env()
+
+_lock = threading.Lock()
+_sessions: Dict[str, requests.Session] = {}
+_async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_seen_streams: weakref.WeakSet = weakref.WeakSet()
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_session(base_url: str) -> requests.Session:
+    """Keep-alive session shared by every caller of the service at `base_url` in this process."""
+    with _lock:
+        if (session := _sessions.get(base_url)) is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.pool_size)
+            session.mount(base_url, adapter)
+            _sessions[base_url] = session
+        return session
+
+
+def get_async_client(base_url: str) -> httpx.AsyncClient:
+    """
+    Pooled asyncio client for the service at `base_url`.
+    Clients are bound to the running event loop, so one is kept per loop.
+    """
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.setdefault(loop, {})
+    if (client := clients.get(base_url)) is None:
+        client = httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(max_connections=settings.pool_size, max_keepalive_connections=settings.pool_size),
+            timeout=httpx.Timeout(settings.read_timeout, connect=settings.connect_timeout),
+        )
+        clients[base_url] = client
+    return client
+
+
+def connections_opened(session: requests.Session, base_url: str) -> int:
+    """How many connections the session's pool for `base_url` has opened, to tell whether a request reused one."""
+    return session.get_adapter(base_url).poolmanager.connection_from_url(base_url).num_connections
+
+
+def is_new_connection(response: httpx.Response) -> Optional[bool]:
+    """Whether an asyncio client response came over a connection not seen before, None if that can't be told."""
+    stream = response.extensions.get("network_stream")
+    if stream is None:
+        return None
+    try:
+        if stream in _seen_streams:
+            return False
+        _seen_streams.add(stream)
+    except TypeError:
+        return None
+    return True
+
+
+def close_session(base_url: str):
+    with _lock:
+        session = _sessions.pop(base_url, None)
+    if session is not None:
+        session.close()
+
+
+def run_in_background(coroutine: Awaitable[T]) -> T:
+    """
+    Run a coroutine to completion on an event loop kept running in a background thread for sync callers, so the
+    asyncio clients it uses, and their pooled connections, are reused from one call to the next.
+    """
+    global _background_loop
+    with _lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(target=_background_loop.run_forever, name="yoyo-clients", daemon=True).start()
+            atexit.register(lambda: asyncio.run_coroutine_threadsafe(aclose_all(), _background_loop).result())
+    return asyncio.run_coroutine_threadsafe(coroutine, _background_loop).result()
+
+
+async def aclose_all():
+    """Close the asyncio clients of the running loop, e.g. from an app shutdown hook."""
+    clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
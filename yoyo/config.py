@@ -1,12 +1,16 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from functools import cache
 from pathlib import Path
+from typing import Dict, Optional, Union
 
-import ruamel.yaml
 from loguru import logger
 from yoyo.path_mapper import PathMap
 
-yaml = ruamel.yaml.YAML()
+
+@cache
+def yaml():
+    import ruamel.yaml
+    return ruamel.yaml.YAML()
 
 
 @dataclass(frozen=True, eq=True)
@@ -17,6 +21,14 @@ class Paths:
     service_models_subdir: Path = Path("models")
     link_spec_file: Path = Path("links.py")
     graph_file: Path = Path("graph.json")
+    registry_file: Path = Path("registry.json")
+    venv_state_file: Path = Path("venvs.json")
+    ports_file: Path = Path("ports.json")
+    symlink_state_file: Path = Path("symlinks.json")
+    image_state_file: Path = Path("images.json")
+    file_hashes_file: Path = Path("hashes.json")
+    metrics_dir: Path = Path("metrics")
+    bench_dir: Path = Path("bench")
 
     def to_json_dict(self):
         return {k: str(getattr(self, k)) for k in self.__annotations__}
@@ -26,27 +38,138 @@ class Paths:
         return cls(**{k: Path(v) for k, v in d.items()})
 
 
+class Settings:
+    def to_json_dict(self):
+        return {k: getattr(self, k) for k in self.__annotations__}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(**d)
+
+
+@dataclass(frozen=True, eq=True)
+class GraphSettings(Settings):
+    link_extraction: str = "static"
+    workers: Optional[int] = None
+    timeout: float = 30
+
+
+@dataclass(frozen=True, eq=True)
+class StartupSettings(Settings):
+    readiness_timeout: float = 30
+    readiness_path: str = "/"
+    poll_interval: float = 0.2
+
+
+@dataclass(frozen=True, eq=True)
+class LogSettings(Settings):
+    rate_limit: Optional[float] = None
+    grep: Optional[str] = None
+    filters: Dict[str, str] = field(default_factory=dict, hash=False)
+    log_dir: Optional[str] = None
+    max_bytes: int = 10 * 1024 * 1024
+    backups: int = 3
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(**{**d, "filters": dict(d.get("filters", {}))})
+
+
+@dataclass(frozen=True, eq=True)
+class SupervisorSettings(Settings):
+    restart: bool = True
+    backoff_initial: float = 1
+    backoff_max: float = 60
+    backoff_reset: float = 60
+    max_restarts: Optional[int] = None
+    sample_interval: float = 2
+    limits: Dict[str, Dict[str, int]] = field(default_factory=dict, hash=False)
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(**{**d, "limits": {k: dict(v) for k, v in d.get("limits", {}).items()}})
+
+
+@dataclass(frozen=True, eq=True)
+class ScalingSettings(Settings):
+    replicas: Union[int, str] = 1
+    workers: Union[int, str] = 1
+    services: Dict[str, Dict[str, Union[int, str]]] = field(default_factory=dict, hash=False)
+
+    @classmethod
+    def from_dict(cls, d):
+        services = {k: dict(v) for k, v in d.get("services", {}).items()}
+        validate_scaling("scaling", {k: v for k, v in d.items() if k != "services"})
+        for service, scaling in services.items():
+            validate_scaling(f"scaling.services.{service}", scaling)
+        return cls(**{**d, "services": services})
+
+
+def validate_scaling(where: str, scaling: dict):
+    """Checked when the config is loaded, rather than failing part way through launching services."""
+    if unknown := set(scaling) - {"replicas", "workers"}:
+        raise ValueError(f"Unknown setting(s) under {where}: {', '.join(sorted(unknown))}.")
+    for key, value in scaling.items():
+        if value != "auto" and (not isinstance(value, int) or isinstance(value, bool) or value < 1):
+            raise ValueError(f"{where}.{key} must be a whole number of at least 1 or 'auto', got {value!r}.")
+
+
+@dataclass(frozen=True, eq=True)
+class WatchSettings(Settings):
+    debounce_ms: int = 500
+    step_ms: int = 50
+
+
+@dataclass(frozen=True, eq=True)
+class CloudRunSettings(Settings):
+    registry: str = "gcr.io/query-router"
+    dockerfile: str = "services/Dockerfile"
+    build_workers: int = 4
+    cache_from: bool = True
+
+
 @dataclass(frozen=True, eq=True)
 class Config:
     paths: Paths = Paths()
+    graph: GraphSettings = GraphSettings()
+    startup: StartupSettings = StartupSettings()
+    logs: LogSettings = LogSettings()
+    supervisor: SupervisorSettings = SupervisorSettings()
+    scaling: ScalingSettings = ScalingSettings()
+    watch: WatchSettings = WatchSettings()
+    cloud_run: CloudRunSettings = CloudRunSettings()
 
     @classmethod
     def from_yml(cls, config: Path):
         with config.open('r') as c:
-            raw = yaml.load(c)
+            raw = yaml().load(c)
         return cls(
-            paths=Paths.from_dict(raw['paths'])
+            paths=Paths.from_dict(raw['paths']),
+            graph=GraphSettings.from_dict(raw.get('graph', {})),
+            startup=StartupSettings.from_dict(raw.get('startup', {})),
+            logs=LogSettings.from_dict(raw.get('logs', {})),
+            supervisor=SupervisorSettings.from_dict(raw.get('supervisor', {})),
+            scaling=ScalingSettings.from_dict(raw.get('scaling', {})),
+            watch=WatchSettings.from_dict(raw.get('watch', {})),
+            cloud_run=CloudRunSettings.from_dict(raw.get('cloud_run', {}))
         )
 
     def to_json_dict(self):
         return {
-            "paths": self.paths.to_json_dict()
+            "paths": self.paths.to_json_dict(),
+            "graph": self.graph.to_json_dict(),
+            "startup": self.startup.to_json_dict(),
+            "logs": self.logs.to_json_dict(),
+            "supervisor": self.supervisor.to_json_dict(),
+            "scaling": self.scaling.to_json_dict(),
+            "watch": self.watch.to_json_dict(),
+            "cloud_run": self.cloud_run.to_json_dict()
         }
 
     def to_yml(self, config: Path):
         logger.info(f"💾 Writing config to file '{config}'.")
         with config.open('w') as c:
-            yaml.dump(self.to_json_dict(), c)
+            yaml().dump(self.to_json_dict(), c)
 
     @cache
     def absolute_paths(self, root):
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import inspect
+import json
+import os
+import signal
+import socket
+import socketserver
+import threading
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Any, Optional, Set
+
+from loguru import logger
+from yoyo.utils import find_root
+
+DAEMON_SOCKET = Path(".yoyo.sock")
+CLIENT_COMMANDS = {"up", "down", "list", "call", "sync", "status", "shutdown"}
+MUTATING_COMMANDS = {"up", "down", "sync"}
+
+
+class DaemonError(RuntimeError):
+    pass
+
+
+def client_command(argv) -> Optional[str]:
+    """
+    The `yy` command in `argv` if the daemon can serve it, found without involving fire. Commands with flags the
+    daemon client can't forward, e.g. `up --watch`, are left to the full CLI.
+    """
+    command, flags, args = None, set(), iter(argv)
+    for arg in args:
+        if arg.startswith('-'):
+            flags.add(arg.lstrip('-').partition('=')[0].replace('-', '_'))
+            if command is None and '=' not in arg:
+                next(args, None)
+        elif command is None:
+            if arg not in CLIENT_COMMANDS:
+                return None
+            command = arg
+    if command is None or not flags <= client_flags(command):
+        return None
+    return command
+
+
+def client_flags(command: str) -> Set[str]:
+    flags = set(f.name for f in fields(DaemonClient) if f.name != 'target')
+    return flags | set(inspect.signature(getattr(DaemonClient, command)).parameters) - {'self'}
+
+
+def daemon_socket(root: Path) -> Path:
+    return root / DAEMON_SOCKET
+
+
+def daemon_available(root: Path) -> bool:
+    path = daemon_socket(root)
+    if not path.exists():
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(str(path))
+        except OSError:
+            return False
+    return True
+
+
+def send(root: Path, command: str, **kwargs) -> Any:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(str(daemon_socket(root)))
+        s.sendall(json.dumps({"command": command, "kwargs": kwargs}).encode() + b"\n")
+        response = json.loads(s.makefile('rb').readline())
+    if not response['ok']:
+        raise DaemonError(response['error'])
+    return response['result']
+
+
+class Daemon:
+    """Keeps config, graph, venv state and running services in memory, serving `yy` commands over a Unix socket."""
+
+    def __init__(self, cli):
+        from yoyo.targets.local.stack import LocalStack
+        self.cli = cli
+        self.stack = LocalStack(cli)
+        self.socket_path = daemon_socket(cli.root_path)
+        self._lock = threading.Lock()
+        self._server: Optional[socketserver.UnixStreamServer] = None
+
+    def serve(self):
+        if daemon_available(self.cli.root_path):
+            raise DaemonError(f"A daemon is already listening on '{self.socket_path}'.")
+        self.socket_path.unlink(missing_ok=True)
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                self.wfile.write(json.dumps(daemon.handle(self.rfile.readline())).encode() + b"\n")
+
+        self._server = socketserver.ThreadingUnixStreamServer(str(self.socket_path), Handler)
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=self._server.shutdown).start())
+        logger.info(f"😈 yoyo daemon listening on '{self.socket_path}' (PID: {os.getpid()})")
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+            self.socket_path.unlink(missing_ok=True)
+            self.stack.stop_all()
+
+    def handle(self, raw: bytes) -> dict:
+        try:
+            request = json.loads(raw)
+            if request['command'] not in CLIENT_COMMANDS:
+                raise DaemonError(f"Unknown command '{request['command']}'.")
+            command = getattr(self, request['command'])
+            if request['command'] in MUTATING_COMMANDS:
+                # Only commands changing the stack or graph wait on each other, `status` answers during a long `up`.
+                with self._lock:
+                    result = command(**request.get('kwargs', {}))
+            else:
+                result = command(**request.get('kwargs', {}))
+            return {"ok": True, "result": result}
+        except Exception as e:
+            logger.exception(f"Daemon command failed: {raw!r}")
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+    def _select(self, find: Optional[str] = None, services=None) -> Set[str]:
+        if isinstance(services, str):
+            return {services}
+        if services:
+            return set(services)
+        return self.cli._graph.search(find) if find else set(self.cli._graph.nodes)
+
+    def up(self, find=None, services=None, build_workers=None):
+        selected = self._select(find, services)
+        kwargs = {"build_workers": build_workers} if build_workers else {}
+        failures = self.stack.start(selected, **kwargs)
+        return {"started": sorted(selected - set(failures)), "failed": {s: str(e) for s, e in failures.items()}}
+
+    def down(self, find=None, services=None):
+        selected = self._select(find, services)
+        self.stack.stop(selected)
+        return sorted(selected)
+
+    def list(self, find=None, services=None):
+        return self.cli._graph.topological_order(self._select(find, services))
+
+    def sync(self):
+        self.cli.__dict__.pop('_graph', None)
+        self.cli.sync()
+        self.stack.streamer.set_names(sorted(self.cli._graph.nodes))
+        return {"nodes": len(self.cli._graph.nodes), "edges": len(self.cli._graph.edges)}
+
+    def call(self, service, method, path, args=None):
+        return self.cli.call(service, method, path, args)
+
+    def status(self):
+        return self.stack.status()
+
+    def shutdown(self):
+        threading.Thread(target=self._server.shutdown).start()
+        return "shutting down"
+
+
+@dataclass
+class DaemonClient:
+    """Thin `yy` front end, forwards commands to the yoyo daemon running for this repo."""
+    root_path: Optional[Path] = None
+    config_path: Path = Path('yoyo.yml')
+    find: Optional[str] = None
+    services: Set[str] = None
+    target: str = 'local'
+
+    def __post_init__(self):
+        self.root_path = Path(self.root_path) if self.root_path else find_root()
+        if isinstance(self.services, str):
+            self.services = [self.services]
+        elif self.services:
+            self.services = sorted(self.services)
+
+    def _send(self, command, **kwargs):
+        return send(self.root_path, command, **kwargs)
+
+    def up(self, build_workers: int = None):
+        """Start services in the daemon"""
+        result = self._send("up", find=self.find, services=self.services, build_workers=build_workers)
+        for service in result['started']:
+            logger.info(f"🚀 {service}")
+        for service, error in result['failed'].items():
+            logger.error(f"❌ {service}: {error}")
+
+    def down(self):
+        """Stop services running in the daemon"""
+        for service in self._send("down", find=self.find, services=self.services):
+            logger.info(f"🛑 {service}")
+
+    def list(self):
+        for service in self._send("list", find=self.find, services=self.services):
+            logger.info(service)
+
+    def sync(self):
+        """Recompile the graph and links in the daemon"""
+        result = self._send("sync")
+        logger.info(f"🔗 {result['nodes']} service(s), {result['edges']} link(s).")
+
+    def call(self, service: str, method: str, path: str, args: Optional[dict] = None):
+        """Call a service through the daemon"""
+        return self._send("call", service=service, method=method, path=path, args=args)
+
+    def status(self):
+        """Show services running in the daemon"""
+        for service, status in self._send("status").items():
+            state = "running" if status['running'] else f"exited ({status['returncode']})"
+            usage = f", CPU: {status['cpu_percent']:.1f}%, RSS: {status['rss'] // 2 ** 20}MB" if 'rss' in status else ""
+            logger.info(f"{service}: {state} (PID: {status['pid']}, restarts: {status['restarts']}{usage})")
+
+    def shutdown(self):
+        """Stop the daemon and every service it runs"""
+        logger.info(self._send("shutdown"))
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import codecs
+import json
+from functools import lru_cache
+from typing import Any, Callable, Iterable, Iterator
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_decoder = json.JSONDecoder()
+ITEM_DELIMITERS = ",] \t\n\r"
+
+
+def loads(raw: bytes) -> Any:
+    """Decode JSON with orjson when it's installed, falling back to the standard library for what it rejects."""
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(raw)
+
+
+@lru_cache(maxsize=None)
+def parser_for(cls, trusted: bool = False) -> Callable[[Any], Any]:
+    """
+    How to build an instance of `cls` from a decoded object, worked out once per class.
+    Trusted parsers construct pydantic models without validating them, for responses from our own services.
+    """
+    if trusted and (construct := getattr(cls, "model_construct", None) or getattr(cls, "construct", None)):
+        return lambda obj: construct(**obj)
+    for name in ("parse_object", "model_validate", "parse_obj"):
+        if (parse := getattr(cls, name, None)) is not None:
+            return parse
+    return lambda obj: cls(**obj)
+
+
+def parse(raw: bytes, cls=None, trusted: bool = False) -> Any:
+    body = loads(raw)
+    if cls is None:
+        return body
+    parser = parser_for(cls, trusted)
+    if isinstance(body, list) and not hasattr(cls, "parse_object"):
+        return [parser(item) for item in body]
+    return parser(body)
+
+
+class JsonArrayParser:
+    """
+    Incremental parser yielding the items of a top level JSON array as its bytes arrive, so large responses can be
+    processed without holding the whole body or its decoded form in memory.
+    """
+
+    def __init__(self):
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ""
+        self._state = "start"
+
+    def feed(self, chunk: bytes, final: bool = False) -> Iterator[Any]:
+        self._buffer += self._utf8.decode(chunk, final=final)
+        pos = 0
+        while True:
+            pos = skip_whitespace(self._buffer, pos)
+            if pos == len(self._buffer):
+                break
+            char = self._buffer[pos]
+            if self._state == "start":
+                if char != "[":
+                    raise ValueError(f"Expected a JSON array, got {self._buffer[pos:pos + 20]!r}.")
+                self._state, pos = "first", pos + 1
+            elif self._state in ("first", "next") and char == "]":
+                self._state, pos = "end", pos + 1
+            elif self._state == "next":
+                if char != ",":
+                    raise ValueError(f"Expected ',' or ']', got {self._buffer[pos:pos + 20]!r}.")
+                self._state, pos = "item", pos + 1
+            elif self._state in ("first", "item"):
+                try:
+                    item, end = _decoder.raw_decode(self._buffer, pos)
+                except json.JSONDecodeError:
+                    break
+                if not final and (end == len(self._buffer) or self._buffer[end] not in ITEM_DELIMITERS):
+                    # A number could carry on in the next chunk, anything else ends with a delimiter anyway.
+                    break
+                yield item
+                self._state, pos = "next", end
+            else:
+                raise ValueError(f"Unexpected data after the JSON array: {self._buffer[pos:pos + 20]!r}.")
+        self._buffer = self._buffer[pos:]
+
+    def close(self) -> Iterator[Any]:
+        yield from self.feed(b"", final=True)
+        if self._state != "end":
+            raise ValueError("JSON array ended early.")
+
+
+def iter_array(chunks: Iterable[bytes], cls=None, trusted: bool = False) -> Iterator[Any]:
+    parser, build = JsonArrayParser(), item_builder(cls, trusted)
+    for chunk in chunks:
+        yield from map(build, parser.feed(chunk))
+    yield from map(build, parser.close())
+
+
+def item_builder(cls=None, trusted: bool = False) -> Callable[[Any], Any]:
+    return parser_for(cls, trusted) if cls is not None else (lambda item: item)
+
+
+def skip_whitespace(text: str, pos: int) -> int:
+    while pos < len(text) and text[pos] in " \t\n\r":
+        pos += 1
+    return pos
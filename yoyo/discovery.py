@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Dict, Tuple
+
+from loguru import logger
+
+DISCOVERY_TTL_ENV_VAR = "YOYO_DISCOVERY_TTL"
+
+
+class DiscoveryCache:
+    """Process-wide cache of the discovered URLs of each service's instances, shared by every `Service` instance."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], Tuple[Tuple[str, ...], float]] = {}
+
+    def get(self, target: TargetDescriptor, service: str) -> Tuple[str, ...]:
+        key = (target.name, service)
+        with self._lock:
+            cached = self._entries.get(key)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+        logger.debug(f"Discovering service '{service}'...")
+        urls = tuple(target.discover(service))
+        with self._lock:
+            self._entries[key] = (urls, time.monotonic() + self.ttl)
+        return urls
+
+    def invalidate(self, target: TargetDescriptor, service: str):
+        with self._lock:
+            self._entries.pop((target.name, service), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+discovery_cache = DiscoveryCache(ttl=float(os.getenv(DISCOVERY_TTL_ENV_VAR, 30)))
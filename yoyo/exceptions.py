@@ -2,4 +2,16 @@ class ServiceNotFound(RuntimeError):
     pass
 
 class ServiceNotExecutable(RuntimeError):
-    pass
\ No newline at end of file
+    pass
+
+class VirtualenvBuildFailed(RuntimeError):
+    pass
+
+class ServiceNotReady(RuntimeError):
+    pass
+
+class ImageBuildFailed(RuntimeError):
+    pass
+
+class ServiceBlocked(RuntimeError):
+    pass
@@ -1,49 +1,96 @@
+import hashlib
 import json
-from dataclasses import dataclass
+import re
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
 from functools import cached_property
 from pathlib import Path
-from typing import Set, Tuple
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
-import networkx as nx
 from loguru import logger
+from yoyo.config import GraphSettings
+from yoyo.link_extraction import extract_links_many, execute_links, execute_links_many
 from yoyo.path_mapper import PathMap
-from yoyo.service import Service
-from yoyo.utils import load_module
+
+SEARCH_TERM = re.compile(r"^(?P<exclude>-)?(?:(?P<up_depth>\d*)(?P<up>\+))?(?P<service>[^+]+?)(?:(?P<down>\+)(?P<down_depth>\d*))?$")
 
 
 @dataclass
 class Graph:
     edges: Set[Tuple[str, str]]
     nodes: Set[str]
+    fingerprints: Dict[str, Optional[str]] = field(default_factory=dict)
+    reachable: Optional[Dict[str, Set[str]]] = None
+
+    def __post_init__(self):
+        if self.reachable is None:
+            self.reachable = transitive_closure(self.nodes, self.callees)
 
     @classmethod
     def from_json(cls, path: Path):
         graph_dict = json.loads(path.read_text())
+        reachable = graph_dict.get('reachable')
         return cls(
             edges=set(tuple(edge) for edge in graph_dict['edges']),
-            nodes=set(graph_dict['nodes'])
+            nodes=set(graph_dict['nodes']),
+            fingerprints=graph_dict.get('fingerprints', {}),
+            reachable={k: set(v) for k, v in reachable.items()} if reachable is not None else None
         )
 
     @classmethod
-    def from_code_links(cls, path_map: PathMap):
+    def load(cls, path_map: PathMap, settings: GraphSettings = GraphSettings()):
+        """Compile the graph, reusing the previously compiled graph file for services whose links are unchanged."""
+        try:
+            cached = cls.from_json(path_map.graph_file)
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            cached = None
+        return cls.from_code_links(path_map, cached, settings)
+
+    @classmethod
+    def from_code_links(cls, path_map: PathMap, cached: Optional["Graph"] = None,
+                        settings: GraphSettings = GraphSettings()):
         nodes = set(s.name for s in path_map.service_dirs)
-        edges = set()
-        for caller in path_map.service_dirs:
-            links_module = load_module(caller, path_map.code_links_file(caller))
-            if not links_module:
+        fingerprints = {service: links_fingerprint(path_map.code_links_file(service)) for service in nodes}
+        if cached is not None and cached.nodes == nodes and cached.fingerprints == fingerprints:
+            return cached
+        cached = cached or cls(edges=set(), nodes=set())
+        changed = set(s for s in nodes if s not in cached.fingerprints or cached.fingerprints[s] != fingerprints[s])
+        edges = set((caller, callee) for (caller, callee) in cached.edges if caller in nodes - changed)
+        if settings.link_extraction == "static":
+            links_files = {caller: path_map.code_links_file(caller) for caller in changed}
+            extracted = extract_links_many(links_files, settings.workers)
+        else:
+            extracted = {}
+        to_execute = set(caller for caller in changed if extracted.get(caller) is None)
+        if settings.link_extraction == "exec":
+            extracted.update({
+                caller: execute_links(path_map.service_dir(caller), path_map.code_links_file(caller))
+                for caller in to_execute
+            })
+        else:
+            extracted.update(execute_links_many(
+                {caller: (path_map.service_dir(caller), path_map.code_links_file(caller)) for caller in to_execute},
+                settings.workers, settings.timeout
+            ))
+        for caller in changed:
+            if (callees := extracted[caller]) is None:
+                logger.warning(f"Keeping previously compiled links for '{caller}'.")
+                edges.update((c, callee) for (c, callee) in cached.edges if c == caller)
+                fingerprints[caller] = cached.fingerprints.get(caller)
                 continue
-            for attr in dir(links_module):
-                if isinstance(callee := getattr(links_module, attr), Service):
-                    edges.add((caller.name, callee.name))
+            edges.update((caller, callee) for callee in callees)
         return cls(
             nodes=nodes,
-            edges=edges
+            edges=edges,
+            fingerprints=fingerprints
         )
 
     def to_dict(self):
         return {
             "edges": [[caller, callee] for (caller, callee) in self.edges],
-            "nodes": list(self.nodes)
+            "nodes": list(self.nodes),
+            "fingerprints": self.fingerprints,
+            "reachable": {node: sorted(callees) for node, callees in self.reachable.items()}
         }
 
     def to_json(self):
@@ -53,11 +100,31 @@ class Graph:
         path.write_text(self.to_json())
 
     @cached_property
-    def nx_graph(self) -> nx.DiGraph:
-        graph = nx.DiGraph()
-        graph.add_nodes_from(self.nodes)
-        graph.add_edges_from(self.edges)
-        return graph
+    def digest(self) -> str:
+        return hashlib.sha256(json.dumps([sorted(self.nodes), sorted(self.edges)]).encode()).hexdigest()
+
+    @cached_property
+    def callees(self) -> Dict[str, Set[str]]:
+        callees = defaultdict(set)
+        for (caller, callee) in self.edges:
+            callees[caller].add(callee)
+        return callees
+
+    @cached_property
+    def callers(self) -> Dict[str, Set[str]]:
+        callers = defaultdict(set)
+        for (caller, callee) in self.edges:
+            callers[callee].add(caller)
+        return callers
+
+    @cached_property
+    def reachable_from(self) -> Dict[str, Set[str]]:
+        """Inverse of `reachable`: every service that transitively calls each service."""
+        reachable_from = defaultdict(set)
+        for caller, callees in self.reachable.items():
+            for callee in callees:
+                reachable_from[callee].add(caller)
+        return reachable_from
 
     def describe(self):
         logger.info(f"🕵️‍♀️ {len(self.nodes)} service(s) present.")
@@ -67,14 +134,119 @@ class Graph:
         for (caller, callee) in self.edges:
             logger.debug(f" • {caller} ➡️ {callee}")
 
-    def search(self, find_expr):
+    def search(self, find_expr) -> Set[str]:
+        """
+        Space separated terms, applied left to right:
+        `svc` the service, `+svc` and its callers, `svc+` and its callees, `2+svc`/`svc+2` only up to 2 links away,
+        and a leading `-` removes the term's services from the selection instead of adding them.
+        """
         services = set()
-        service_expressions = find_expr.split(' ')
-        for expression in service_expressions:
-            service = expression.strip('+')
-            services.add(service)
-            if expression.startswith('+'):
-                services.update(nx.ancestors(self.nx_graph, service))
-            if expression.endswith('+'):
-                services.update(nx.descendants(self.nx_graph, service))
+        for expression in find_expr.split():
+            if not (term := SEARCH_TERM.match(expression)):
+                raise ValueError(f"Invalid search term '{expression}'.")
+            service = term['service']
+            matched = {service}
+            if term['up']:
+                matched.update(self._neighbours(service, self.callers, self.reachable_from, term['up_depth']))
+            if term['down']:
+                matched.update(self._neighbours(service, self.callees, self.reachable, term['down_depth']))
+            if term['exclude']:
+                services -= matched
+            else:
+                services |= matched
         return services
+
+    @staticmethod
+    def _neighbours(service, adjacency, closure, depth: str) -> Set[str]:
+        if not depth:
+            return closure.get(service, set())
+        return within_depth(service, adjacency, int(depth))
+
+    def topological_order(self, services: Iterable[str]) -> List[str]:
+        """Services ordered so callees come before their callers."""
+        waves, _ = self.waves(services)
+        return [service for wave in waves for service in wave]
+
+    def waves(self, services: Iterable[str]) -> Tuple[List[List[str]], List[Set[str]]]:
+        """
+        Group services into waves where every service's callees, direct or through unselected services, are in earlier
+        waves, so each wave can start once the previous one is up.
+        Services calling each other in a cycle share a wave and are also returned as cycles.
+        """
+        services = set(services)
+        adjacency = {s: self.reachable.get(s, set()) & services for s in services}
+        components = strongly_connected_components(services, adjacency)
+        component_of = {s: i for i, component in enumerate(components) for s in component}
+        depths = []
+        for i, component in enumerate(components):
+            callee_components = set(component_of[c] for s in component for c in adjacency[s]) - {i}
+            depths.append(1 + max((depths[j] for j in callee_components), default=-1))
+        waves = [[] for _ in range(max(depths, default=-1) + 1)]
+        for component, depth in zip(components, depths):
+            waves[depth].extend(component)
+        cycles = [c for c in components if len(c) > 1 or any(s in adjacency[s] for s in c)]
+        return [sorted(wave) for wave in waves], cycles
+
+
+def strongly_connected_components(nodes: Iterable[str], adjacency: Dict[str, Set[str]]) -> List[Set[str]]:
+    """Tarjan's algorithm, iteratively. Components come out callees first."""
+    index, lowlink, stack, on_stack, components = {}, {}, [], set(), []
+
+    def visit(node):
+        index[node] = lowlink[node] = len(index)
+        stack.append(node)
+        on_stack.add(node)
+        return node, iter(sorted(adjacency.get(node, ())))
+
+    for root in sorted(nodes):
+        if root in index:
+            continue
+        work = [visit(root)]
+        while work:
+            node, neighbours = work[-1]
+            for neighbour in neighbours:
+                if neighbour not in index:
+                    work.append(visit(neighbour))
+                    break
+                if neighbour in on_stack:
+                    lowlink[node] = min(lowlink[node], index[neighbour])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = set()
+                    while (member := stack.pop()) != node:
+                        on_stack.discard(member)
+                        component.add(member)
+                    on_stack.discard(node)
+                    component.add(node)
+                    components.append(component)
+    return components
+
+
+def transitive_closure(nodes: Iterable[str], callees: Dict[str, Set[str]]) -> Dict[str, Set[str]]:
+    return {node: within_depth(node, callees) for node in nodes}
+
+
+def within_depth(start: str, adjacency: Dict[str, Set[str]], max_depth: Optional[int] = None) -> Set[str]:
+    """Services reachable from `start` in at most `max_depth` links, excluding `start` unless it's in a cycle."""
+    found = set()
+    queue = deque([(start, 0)])
+    while queue:
+        service, depth = queue.popleft()
+        if max_depth is not None and depth >= max_depth:
+            continue
+        for neighbour in adjacency.get(service, ()):
+            if neighbour not in found:
+                found.add(neighbour)
+                queue.append((neighbour, depth + 1))
+    return found
+
+
+def links_fingerprint(links_file: Path) -> Optional[str]:
+    try:
+        return hashlib.sha256(links_file.read_bytes()).hexdigest()
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import ast
+import contextlib
+import json
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+
+from loguru import logger
+from yoyo.utils import load_module
+
+SERVICE_MODULE = "yoyo.service"
+SERVICE_CLASS = "Service"
+MIN_SERVICES_FOR_POOL = 16
+INERT_MODULES = ("__future__", "typing")
+
+
+class Unresolvable(Exception):
+    pass
+
+
+def extract_links(links_file: Path) -> Optional[Set[str]]:
+    """
+    Names of the services a links file links to, found by parsing rather than executing it.
+    Only module level `name = Service("callee")` style assignments are understood, None is returned for anything
+    that could bind a Service some other way so the caller can fall back to executing the file.
+    """
+    try:
+        tree = ast.parse(links_file.read_bytes(), filename=str(links_file))
+    except FileNotFoundError:
+        return set()
+    except (SyntaxError, ValueError):
+        return None
+    try:
+        return _LinksModule().extract(tree)
+    except Unresolvable:
+        return None
+
+
+def extract_links_many(links_files: Dict[str, Path], workers: Optional[int] = None) -> Dict[str, Optional[Set[str]]]:
+    """`extract_links` for many services, on a process pool when there are enough of them to be worth it."""
+    if len(links_files) < MIN_SERVICES_FOR_POOL:
+        return {service: extract_links(path) for service, path in links_files.items()}
+    from concurrent.futures import ProcessPoolExecutor  # Pulls in multiprocessing, only worth it for many services.
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(extract_links, links_files.values(), chunksize=8)
+        return dict(zip(links_files, results))
+
+
+def execute_links(service_dir: Path, links_file: Path) -> Set[str]:
+    """Names of the services a links file links to, found by importing it into this process."""
+    from yoyo.service import Service
+    links_module = load_module(service_dir, links_file)
+    if not links_module:
+        return set()
+    return set(
+        callee.name for attr in dir(links_module)
+        if isinstance(callee := getattr(links_module, attr), Service)
+    )
+
+
+def execute_links_isolated(service_dir: Path, links_file: Path, timeout: float) -> Set[str]:
+    """`execute_links` in a fresh interpreter, so the links file can't hang, crash or pollute this one."""
+    result = subprocess.run(
+        [sys.executable, "-m", "yoyo.link_extraction", str(service_dir), str(links_file)],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding='utf-8', timeout=timeout
+    )
+    if result.returncode:
+        stderr = result.stderr.strip().splitlines()
+        raise RuntimeError(stderr[-1] if stderr else f"exit code {result.returncode}")
+    return set(json.loads(result.stdout))
+
+
+def execute_links_many(links_files: Dict[str, Tuple[Path, Path]], workers: Optional[int] = None,
+                       timeout: float = 30) -> Dict[str, Optional[Set[str]]]:
+    """
+    `execute_links_isolated` for many services, `workers` at a time.
+    Services whose links couldn't be evaluated are logged and mapped to None.
+    """
+    def execute(item):
+        service, (service_dir, links_file) = item
+        logger.debug(f"Executing links for '{service}'...")
+        try:
+            return service, execute_links_isolated(service_dir, links_file, timeout)
+        except subprocess.TimeoutExpired:
+            logger.error(f"⏱ Timed out after {timeout}s evaluating links for '{service}'.")
+        except Exception as e:
+            logger.error(f"❌ Failed to evaluate links for '{service}': {e}")
+        return service, None
+
+    if not links_files:
+        return {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(executor.map(execute, links_files.items()))
+
+
+class _LinksModule:
+    def __init__(self):
+        self.service_names: Set[str] = set()
+        self.service_modules: Set[str] = set()
+        self.bindings: Dict[str, Optional[str]] = {}
+
+    def extract(self, tree: ast.Module) -> Set[str]:
+        for statement in tree.body:
+            self.statement(statement)
+        return set(callee for callee in self.bindings.values() if callee is not None)
+
+    def statement(self, node: ast.stmt):
+        if isinstance(node, ast.ImportFrom):
+            self.import_from(node)
+        elif isinstance(node, ast.Import):
+            self.import_(node)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            self.assign(node)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            self.bindings[node.name] = None
+        elif isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant):
+            pass
+        elif isinstance(node, ast.If) and is_type_checking(node.test) and not node.orelse:
+            pass
+        elif not isinstance(node, ast.Pass):
+            raise Unresolvable(ast.dump(node))
+
+    def import_from(self, node: ast.ImportFrom):
+        if node.module in INERT_MODULES:
+            for alias in node.names:
+                self.bindings[alias.asname or alias.name] = None
+            return
+        if node.level or node.module not in (SERVICE_MODULE, SERVICE_MODULE.rpartition('.')[0]):
+            raise Unresolvable(f"from {node.module} import ...")
+        for alias in node.names:
+            bound = alias.asname or alias.name
+            if node.module == SERVICE_MODULE and alias.name in (SERVICE_CLASS, "*"):
+                self.service_names.add(SERVICE_CLASS if alias.name == "*" else bound)
+            elif node.module != SERVICE_MODULE and alias.name == SERVICE_MODULE.rpartition('.')[2]:
+                self.service_modules.add(bound)
+            self.bindings.setdefault(bound, None)
+
+    def import_(self, node: ast.Import):
+        for alias in node.names:
+            if alias.name == SERVICE_MODULE:
+                self.service_modules.add(alias.asname or SERVICE_MODULE)
+            self.bindings[alias.asname or alias.name.partition('.')[0]] = None
+
+    def assign(self, node):
+        if node.value is None:
+            return
+        callee = self.value(node.value)
+        targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+        for target in targets:
+            if not isinstance(target, ast.Name):
+                raise Unresolvable(ast.dump(target))
+            self.bindings[target.id] = callee
+
+    def value(self, node: ast.expr) -> Optional[str]:
+        if isinstance(node, ast.Call) and self.is_service(node.func):
+            return service_name(node)
+        if isinstance(node, ast.Name):
+            return self.bindings.get(node.id)
+        if any(isinstance(n, (ast.Call, ast.Attribute, ast.Name, ast.Lambda, ast.NamedExpr)) for n in ast.walk(node)):
+            raise Unresolvable(ast.dump(node))
+        return None
+
+    def is_service(self, func: ast.expr) -> bool:
+        if isinstance(func, ast.Name):
+            return func.id in self.service_names
+        return isinstance(func, ast.Attribute) and func.attr == SERVICE_CLASS and \
+            dotted_name(func.value) in self.service_modules
+
+
+def service_name(call: ast.Call) -> str:
+    name = call.args[0] if call.args else next((k.value for k in call.keywords if k.arg == "name"), None)
+    if isinstance(name, ast.Constant) and isinstance(name.value, str):
+        return name.value
+    raise Unresolvable(ast.dump(call))
+
+
+def dotted_name(node: ast.expr) -> Optional[str]:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute) and (parent := dotted_name(node.value)):
+        return f"{parent}.{node.attr}"
+    return None
+
+
+def is_type_checking(test: ast.expr) -> bool:
+    return dotted_name(test) in ("TYPE_CHECKING", "typing.TYPE_CHECKING")
+
+
+if __name__ == '__main__':
+    _service_dir, _links_file = map(Path, sys.argv[1:3])
+    with contextlib.redirect_stdout(sys.stderr):
+        _callees = execute_links(_service_dir, _links_file)
+    print(json.dumps(sorted(_callees)))
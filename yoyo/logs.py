@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import os
+import re
+import selectors
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, List, Optional
+
+from yoyo.config import LogSettings
+from yoyo.utils import get_n_colours, rgb_to_logger_rgb
+
+READ_SIZE = 64 * 1024
+FLUSH_INTERVAL = 0.05
+DROP_REPORT_INTERVAL = 5
+RESET = b"\x1b[0m"
+
+
+class RotatingFile:
+    def __init__(self, path: Path, max_bytes: int, backups: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        path.parent.mkdir(exist_ok=True, parents=True)
+        self._file = path.open('ab')
+        self._size = self._file.tell()
+
+    def write(self, data: bytes):
+        if self._size + len(data) > self.max_bytes and self._size:
+            self._rotate()
+        self._file.write(data)
+        self._size += len(data)
+
+    def _rotate(self):
+        self._file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if (older := self.path.with_name(f"{self.path.name}.{i}")).exists():
+                older.replace(self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backups:
+            self.path.replace(self.path.with_name(f"{self.path.name}.1"))
+        self._file = self.path.open('wb')
+        self._size = 0
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class _Stream:
+    def __init__(self, name: str, process: subprocess.Popen, prefix: bytes, settings: LogSettings,
+                 log_file: Optional[RotatingFile], service: str):
+        self.name = name
+        self.process = process
+        self.fd = process.stdout.fileno()
+        self.prefix = prefix
+        self.rate_limit = settings.rate_limit
+        self.tokens = max(1.0, settings.rate_limit) if settings.rate_limit else 0
+        self.last_refill = time.monotonic()
+        self.dropped = 0
+        self.filter = filter_for(service, settings)
+        self.log_file = log_file
+        self.partial = b""
+        os.set_blocking(self.fd, False)
+
+    def feed(self, data: bytes, out: List[bytes]):
+        if self.log_file is not None:
+            self.log_file.write(data)
+        lines = (self.partial + data).split(b"\n")
+        self.partial = lines.pop()
+        self._emit(lines, out)
+
+    def finish(self, out: List[bytes]):
+        if self.partial:
+            self._emit([self.partial], out)
+            self.partial = b""
+        if self.log_file is not None:
+            self.log_file.close()
+        self.process.stdout.close()
+
+    def report_dropped(self, out: List[bytes]):
+        if self.dropped:
+            out.append(self.prefix + f"… dropped {self.dropped} line(s) over the rate limit".encode() + RESET + b"\n")
+            self.dropped = 0
+
+    def _emit(self, lines: List[bytes], out: List[bytes]):
+        if self.filter is not None:
+            lines = [line for line in lines if self.filter.search(line)]
+        if self.rate_limit:
+            now = time.monotonic()
+            # The bucket holds at least one line, so rates under one line a second still let lines through.
+            burst = max(1.0, self.rate_limit)
+            self.tokens = min(burst, self.tokens + (now - self.last_refill) * self.rate_limit)
+            self.last_refill = now
+            allowed = []
+            for line in lines:
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    allowed.append(line)
+                else:
+                    self.dropped += 1
+            lines = allowed
+        for line in lines:
+            out.append(self.prefix + line.rstrip(b"\r") + RESET + b"\n")
+
+
+class LogMultiplexer:
+    """
+    Streams the output of processes as they are added, each line prefixed with its name in its own colour.
+    Every pipe is read from one thread with a selector, in large chunks, and output is written in batches.
+    Lines can be filtered and rate limited per service (dropped lines are counted and reported) and optionally
+    copied to a rotating log file per service.
+    """
+
+    def __init__(self, names: Iterable[str], settings: LogSettings = LogSettings(), log_dir: Optional[Path] = None,
+                 output: Optional[BinaryIO] = None):
+        self.set_names(names)
+        self.settings = settings
+        self.log_dir = log_dir
+        self.output = output or sys.stderr.buffer
+        self._selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = os.pipe()
+        self._selector.register(self._wake_r, selectors.EVENT_READ)
+        self._pending: List[_Stream] = []
+        self._streams: Dict[int, _Stream] = {}
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+        self._last_drop_report = time.monotonic()
+
+    def set_names(self, names: Iterable[str]):
+        """Assign a colour to each name, e.g. again once services have been added. Open streams keep theirs."""
+        names = list(names)
+        rgbs = dict(zip(names, get_n_colours(len(names))))
+        self.colours = {name: rgb_to_logger_rgb(rgb) for name, rgb in rgbs.items()}
+        self._ansi = {name: "\x1b[38;2;{};{};{}m".format(*rgb).encode() for name, rgb in rgbs.items()}
+
+    def stream(self, name: str, process: subprocess.Popen, service: Optional[str] = None):
+        """Stream a process's output under `name`, in the colour and with the filter of `service` if it's a replica."""
+        service = service or name
+        prefix = f"[{name}] ".encode() + self._ansi.get(service, b"")
+        log_file = None
+        if self.log_dir is not None:
+            log_file = RotatingFile(self.log_dir / f"{name}.log", self.settings.max_bytes, self.settings.backups)
+        with self._lock:
+            self._pending.append(_Stream(name, process, prefix, self.settings, log_file, service))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="yoyo-logs", daemon=True)
+                self._thread.start()
+        os.write(self._wake_w, b"\0")
+
+    def wait(self):
+        """Block until every stream added so far has closed."""
+        with self._idle:
+            self._idle.wait_for(lambda: not self._streams and not self._pending)
+
+    def _run(self):
+        while True:
+            out: List[bytes] = []
+            for key, _ in self._selector.select(timeout=FLUSH_INTERVAL):
+                if key.fd == self._wake_r:
+                    os.read(self._wake_r, READ_SIZE)
+                    self._add_pending()
+                    continue
+                stream = self._streams[key.fd]
+                try:
+                    data = os.read(key.fd, READ_SIZE)
+                except BlockingIOError:
+                    continue
+                if data:
+                    stream.feed(data, out)
+                else:
+                    self._close(stream, out)
+            self._report_drops(out)
+            self._write(out)
+
+    def _add_pending(self):
+        with self._lock:
+            for stream in self._pending:
+                self._streams[stream.fd] = stream
+                self._selector.register(stream.fd, selectors.EVENT_READ)
+            self._pending.clear()
+
+    def _close(self, stream: _Stream, out: List[bytes]):
+        self._selector.unregister(stream.fd)
+        stream.finish(out)
+        stream.report_dropped(out)
+        with self._lock:
+            del self._streams[stream.fd]
+            self._idle.notify_all()
+
+    def _report_drops(self, out: List[bytes]):
+        if time.monotonic() - self._last_drop_report < DROP_REPORT_INTERVAL:
+            return
+        self._last_drop_report = time.monotonic()
+        for stream in self._streams.values():
+            stream.report_dropped(out)
+
+    def _write(self, out: List[bytes]):
+        if out:
+            self.output.write(b"".join(out))
+            self.output.flush()
+        for stream in self._streams.values():
+            if stream.log_file is not None:
+                stream.log_file.flush()
+
+
+def filter_for(name: str, settings: LogSettings) -> Optional[re.Pattern]:
+    pattern = settings.filters.get(name, settings.grep)
+    return re.compile(pattern.encode()) if pattern else None
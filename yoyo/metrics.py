@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+SERVICE_NAME_ENV_VAR = "YOYO_SERVICE_NAME"
+METRICS_DIR_ENV_VAR = "YOYO_METRICS_DIR"
+METRICS_INTERVAL_ENV_VAR = "YOYO_METRICS_INTERVAL"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+EdgeKey = Tuple[str, str, str, str]
+
+
+@dataclass
+class Histogram:
+    buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    counts: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    sum: float = 0.0
+    count: int = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other: Histogram):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.sum += other.sum
+        self.count += other.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated by interpolating within the bucket the quantile falls in, as Prometheus does."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def to_dict(self):
+        return {"counts": self.counts, "sum": self.sum, "count": self.count}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(counts=list(d['counts']), sum=d['sum'], count=d['count'])
+
+
+@dataclass
+class EdgeStats:
+    latency: Histogram = field(default_factory=Histogram)
+    request_bytes: int = 0
+    response_bytes: int = 0
+    statuses: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    connections: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    @property
+    def errors(self) -> int:
+        return sum(n for status, n in self.statuses.items() if not status.startswith(("1", "2", "3")))
+
+    def merge(self, other: EdgeStats):
+        self.latency.merge(other.latency)
+        self.request_bytes += other.request_bytes
+        self.response_bytes += other.response_bytes
+        for status, n in other.statuses.items():
+            self.statuses[status] += n
+        for kind, n in other.connections.items():
+            self.connections[kind] += n
+
+    def to_dict(self):
+        return {
+            "latency": self.latency.to_dict(), "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes, "statuses": dict(self.statuses),
+            "connections": dict(self.connections)
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        stats = cls(Histogram.from_dict(d['latency']), d['request_bytes'], d['response_bytes'])
+        stats.statuses.update(d['statuses'])
+        stats.connections.update(d['connections'])
+        return stats
+
+
+class CallMetrics:
+    """
+    Latency, bytes, status codes and connection reuse of every call this process makes to another service, keyed
+    by (caller, callee, method, path). The caller is the service this process runs, from YOYO_SERVICE_NAME.
+    """
+
+    def __init__(self, caller: Optional[str] = None):
+        self.caller = caller or os.getenv(SERVICE_NAME_ENV_VAR, "cli")
+        self.edges: Dict[EdgeKey, EdgeStats] = {}
+        self._lock = threading.Lock()
+        self._snapshots_started = False
+
+    def record(self, callee: str, method: str, path: str, seconds: float, status: str, request_bytes: int = 0,
+               response_bytes: int = 0, reused: Optional[bool] = None):
+        key = (self.caller, callee, method.upper(), path.partition('?')[0])
+        with self._lock:
+            if (stats := self.edges.get(key)) is None:
+                stats = self.edges[key] = EdgeStats()
+            stats.latency.observe(seconds)
+            stats.request_bytes += request_bytes
+            stats.response_bytes += response_bytes
+            stats.statuses[status] += 1
+            if reused is not None:
+                stats.connections["reused" if reused else "new"] += 1
+        if not self._snapshots_started:
+            self.start_snapshots()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            edges = [
+                {"caller": caller, "callee": callee, "method": method, "path": path, **stats.to_dict()}
+                for (caller, callee, method, path), stats in self.edges.items()
+            ]
+        return {"caller": self.caller, "pid": os.getpid(), "time": time.time(), "edges": edges}
+
+    def prometheus(self) -> str:
+        """The metrics in the Prometheus text exposition format, each family's samples grouped under its type."""
+        with self._lock:
+            edges = [(prometheus_labels(key), stats) for key, stats in sorted(self.edges.items())]
+            lines = ["# TYPE yoyo_call_duration_seconds histogram"]
+            for labels, stats in edges:
+                cumulative = 0
+                for bound, count in zip((*stats.latency.buckets, "+Inf"), stats.latency.counts):
+                    cumulative += count
+                    lines.append(f'yoyo_call_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"yoyo_call_duration_seconds_sum{{{labels}}} {stats.latency.sum}")
+                lines.append(f"yoyo_call_duration_seconds_count{{{labels}}} {stats.latency.count}")
+            lines.append("# TYPE yoyo_call_request_bytes_total counter")
+            lines.extend(f"yoyo_call_request_bytes_total{{{labels}}} {s.request_bytes}" for labels, s in edges)
+            lines.append("# TYPE yoyo_call_response_bytes_total counter")
+            lines.extend(f"yoyo_call_response_bytes_total{{{labels}}} {s.response_bytes}" for labels, s in edges)
+            lines.append("# TYPE yoyo_call_responses_total counter")
+            lines.extend(
+                f'yoyo_call_responses_total{{{labels},status="{status}"}} {n}'
+                for labels, stats in edges for status, n in sorted(stats.statuses.items())
+            )
+            lines.append("# TYPE yoyo_call_connections_total counter")
+            lines.extend(
+                f'yoyo_call_connections_total{{{labels},reused="{"true" if kind == "reused" else "false"}"}} {n}'
+                for labels, stats in edges for kind, n in sorted(stats.connections.items())
+            )
+        return "\n".join(lines) + "\n"
+
+    async def asgi_app(self, scope, receive, send):
+        """ASGI app serving `prometheus()`, e.g. `app.mount("/metrics", metrics.asgi_app)` in a FastAPI service."""
+        if scope['type'] != 'http':
+            return
+        body = self.prometheus().encode()
+        await send({
+            "type": "http.response.start", "status": 200,
+            "headers": [(b"content-type", b"text/plain; version=0.0.4"), (b"content-length", str(len(body)).encode())]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    def start_snapshots(self):
+        """Periodically write a JSON snapshot to YOYO_METRICS_DIR, if set, and once more on exit."""
+        with self._lock:
+            if self._snapshots_started:
+                return
+            self._snapshots_started = True
+        if not os.getenv(METRICS_DIR_ENV_VAR):
+            return
+        threading.Thread(target=self._write_snapshots, name="yoyo-metrics", daemon=True).start()
+        atexit.register(self.write_snapshot)
+
+    def write_snapshot(self):
+        directory = Path(os.environ[METRICS_DIR_ENV_VAR])
+        directory.mkdir(exist_ok=True, parents=True)
+        path = directory / f"{self.caller}-{os.getpid()}.json"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.snapshot()))
+        os.replace(tmp, path)
+
+    def _write_snapshots(self):
+        interval = float(os.getenv(METRICS_INTERVAL_ENV_VAR, 10))
+        while True:
+            time.sleep(interval)
+            self.write_snapshot()
+
+
+metrics = CallMetrics()
+
+
+def prometheus_labels(key: EdgeKey) -> str:
+    names = ("caller", "callee", "method", "path")
+    return ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(names, key))
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def load_edge_stats(directory: Path) -> Dict[Tuple[str, str], EdgeStats]:
+    """Stats per (caller, callee) merged from every snapshot written to `directory`."""
+    edges: Dict[Tuple[str, str], EdgeStats] = defaultdict(EdgeStats)
+    for path in sorted(directory.glob("*.json")):
+        try:
+            snapshot = json.loads(path.read_text())
+        except (OSError, json.JSONDecodeError):
+            continue
+        for edge in snapshot['edges']:
+            edges[(edge['caller'], edge['callee'])].merge(EdgeStats.from_dict(edge))
+    return edges
+
+
+def format_edge_stats(edges: Iterable[Tuple[str, str]], stats: Dict[Tuple[str, str], EdgeStats]) -> str:
+    """Table of edges with their measured stats, those taking the most total time first."""
+    def ms(seconds: Optional[float]) -> str:
+        return f"{seconds * 1000:.1f}" if seconds is not None else "-"
+
+    edges: Set[Tuple[str, str]] = set(edges)
+    rows = [("CALLER", "CALLEE", "CALLS", "ERRORS", "P50 MS", "P99 MS", "TOTAL S", "KB IN", "KB OUT", "REUSED")]
+    for edge in sorted(edges | set(stats), key=lambda e: (-(stats[e].latency.sum if e in stats else 0), e)):
+        caller, callee = edge
+        if edge not in edges:
+            callee = f"{callee} (unlinked)"
+        s = stats.get(edge, EdgeStats())
+        connections = sum(s.connections.values())
+        rows.append((
+            caller, callee, str(s.latency.count), str(s.errors), ms(s.latency.quantile(0.5)),
+            ms(s.latency.quantile(0.99)), f"{s.latency.sum:.2f}", f"{s.request_bytes / 1024:.1f}",
+            f"{s.response_bytes / 1024:.1f}", f"{s.connections['reused'] / connections:.0%}" if connections else "-"
+        ))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows)
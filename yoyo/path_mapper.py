@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Tuple, Generator
@@ -23,14 +24,13 @@ class PathMap:
 
     @property
     def service_dirs(self) -> Generator[Path]:
-        return (s for s in self.services_dir.iterdir() if is_service_dir(s))
+        with os.scandir(self.services_dir) as entries:
+            return (Path(e.path) for e in list(entries) if is_service_entry(e))
 
     def get_linked_dirs(self, service: Path) -> Tuple[Path]:
         try:
-            return tuple(
-                s for s in self.links_dir(service).iterdir()
-                if is_service_dir(s)
-            )
+            with os.scandir(self.links_dir(service)) as entries:
+                return tuple(Path(e.path) for e in entries if is_service_entry(e))
         except FileNotFoundError:
             return tuple()
 
@@ -38,6 +38,38 @@ class PathMap:
     def graph_file(self):
         return self.generated_dir / self.paths.graph_file
 
+    @property
+    def registry_file(self):
+        return self.generated_dir / self.paths.registry_file
+
+    @property
+    def venv_state_file(self):
+        return self.generated_dir / self.paths.venv_state_file
+
+    @property
+    def ports_file(self):
+        return self.generated_dir / self.paths.ports_file
+
+    @property
+    def symlink_state_file(self):
+        return self.generated_dir / self.paths.symlink_state_file
+
+    @property
+    def image_state_file(self):
+        return self.generated_dir / self.paths.image_state_file
+
+    @property
+    def file_hashes_file(self):
+        return self.generated_dir / self.paths.file_hashes_file
+
+    @property
+    def metrics_dir(self):
+        return self.generated_dir / self.paths.metrics_dir
+
+    @property
+    def bench_dir(self):
+        return self.generated_dir / self.paths.bench_dir
+
     def links_dir(self, service: Path) -> Path:
         return self.service_dir(service) / self.paths.service_links_subdir
 
@@ -60,3 +92,8 @@ class PathMap:
 
 def is_service_dir(service: Path):
     return service.is_dir() or service.is_symlink() and not service.name.startswith("_")
+
+
+def is_service_entry(entry: os.DirEntry):
+    """`is_service_dir` from a scandir entry, using the file type it cached rather than stat calls."""
+    return entry.is_dir() or entry.is_symlink() and not entry.name.startswith("_")
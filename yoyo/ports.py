@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import socket
+import threading
+from pathlib import Path
+from typing import Dict, Iterable
+
+from loguru import logger
+from yoyo.state import read_json, write_json
+
+LISTEN_BACKLOG = 2048
+
+
+class PortAllocator:
+    """
+    Binds a listening socket for each service, or each replica of one, before anything is launched, so ports can't be
+    taken in between, and hands them to uvicorn by file descriptor. Each keeps the same port across runs where free.
+    """
+
+    def __init__(self, path: Path, host: str = "0.0.0.0"):
+        self.path = path
+        self.host = host
+        self.sockets: Dict[str, socket.socket] = {}
+        self._lock = threading.Lock()
+
+    def read(self) -> Dict[str, int]:
+        return read_json(self.path)
+
+    def reserve(self, services: Iterable[str]) -> Dict[str, int]:
+        with self._lock:
+            assignments = self.read()
+            taken = set(port for service, port in assignments.items() if service not in self.sockets)
+            for service in services:
+                if service in self.sockets:
+                    continue
+                preferred = assignments.get(service, 0)
+                sock = self._bind(preferred)
+                if sock is None:
+                    logger.warning(f"Port {preferred} for '{service}' is in use, allocating a new one.")
+                    sock = self._bind(0)
+                while sock.getsockname()[1] in taken - {preferred}:
+                    sock.close()
+                    sock = self._bind(0)
+                self.sockets[service] = sock
+                assignments[service] = sock.getsockname()[1]
+            write_json(self.path, assignments)
+            return {service: assignments[service] for service in self.sockets}
+
+    def _bind(self, port: int):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind((self.host, port))
+        except OSError:
+            sock.close()
+            return None
+        sock.listen(LISTEN_BACKLOG)
+        sock.set_inheritable(True)
+        return sock
+
+    def socket(self, service: str) -> socket.socket:
+        return self.sockets[service]
+
+    def port(self, service: str) -> int:
+        return self.sockets[service].getsockname()[1]
+
+    def release(self, service: str):
+        with self._lock:
+            if (sock := self.sockets.pop(service, None)) is not None:
+                sock.close()
+
+    def close(self):
+        for service in list(self.sockets):
+            self.release(service)
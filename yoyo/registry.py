@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from loguru import logger
+from yoyo.state import read_json, write_json
+
+SERVICE_REGISTRY_ENV_VAR = "YOYO_SERVICE_REGISTRY"
+
+
+@dataclass(frozen=True, eq=True)
+class ServiceRegistry:
+    """
+    Record of locally running service processes (name -> service/port/pid), written by `yy up` and read by discovery.
+    A service running a single replica is registered under its own name, replicas as '<service>#<n>'.
+    Changes are serialised, as the supervisor's thread updates entries while services are being launched.
+    """
+    path: Path
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+
+    @classmethod
+    def from_env(cls) -> Optional[ServiceRegistry]:
+        if path := os.getenv(SERVICE_REGISTRY_ENV_VAR):
+            return cls(Path(path))
+        return None
+
+    def to_env(self, process_env):
+        process_env[SERVICE_REGISTRY_ENV_VAR] = str(self.path)
+
+    def read(self) -> Dict[str, dict]:
+        return read_json(self.path)
+
+    def write(self, entries: Dict[str, dict]):
+        write_json(self.path, entries)
+
+    def register(self, name: str, port: int, pid: int, service: Optional[str] = None):
+        with self._lock:
+            entries = self.read()
+            entries[name] = {"service": service or name, "port": int(port), "pid": pid, "started": time.time()}
+            self.write(entries)
+
+    def update(self, name: str, **info):
+        with self._lock:
+            entries = self.read()
+            if name in entries:
+                entries[name].update(info)
+                self.write(entries)
+
+    def unregister(self, name: str):
+        with self._lock:
+            entries = self.read()
+            if entries.pop(name, None) is not None:
+                self.write(entries)
+
+    def lookup(self, name: str) -> Optional[dict]:
+        """Registered entry, or None if missing or the process is no longer that service."""
+        entry = self.read().get(name)
+        if entry is None or not is_service_process(entry['pid'], service_of(name, entry)):
+            return None
+        return entry
+
+    def instances(self, service: str) -> Dict[str, dict]:
+        """Registered entries of the service's running instances by name, newest first."""
+        entries = [
+            (name, entry) for name, entry in self.read().items()
+            if service_of(name, entry) == service and is_service_process(entry['pid'], service)
+        ]
+        return dict(sorted(entries, key=lambda e: e[1].get('started', 0), reverse=True))
+
+
+def replica_name(service: str, replica: int, replicas: int) -> str:
+    return service if replicas == 1 else f"{service}#{replica + 1}"
+
+
+def service_of(name: str, entry: Optional[dict] = None) -> str:
+    """The service a registered process or replica name belongs to."""
+    return (entry or {}).get('service') or name.partition('#')[0]
+
+
+def is_service_process(pid: int, service: str) -> bool:
+    import psutil
+    try:
+        cmd = ' '.join(psutil.Process(pid).cmdline())
+    except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+        return False
+    return 'uvicorn' in cmd and service in cmd
+
+
+def stop_registered(registry: ServiceRegistry, service: str):
+    import psutil
+    for name, entry in registry.instances(service).items():
+        logger.info(f"🛑 Stopping '{name}' (PID: {entry['pid']})")
+        psutil.Process(entry['pid']).terminate()
+    for name, entry in registry.read().items():
+        if service_of(name, entry) == service:
+            registry.unregister(name)
@@ -1,20 +1,43 @@
 from __future__ import annotations
 
+import asyncio
+import time
 from dataclasses import dataclass
 from functools import cached_property
-from typing import Optional
+from typing import Any, AsyncIterator, Iterable, Iterator, List, Optional, Tuple
 from urllib.parse import urljoin
 
 from loguru import logger
-from requests import request
+from yoyo.balancer import Instance, LoadBalancer, balancer_for
+from yoyo.discovery import discovery_cache
 from yoyo.targets.target_handler import TargetHandler
 
+Call = Tuple[str, str, Optional[dict]]
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class CallResult:
+    """Outcome of a single call made as part of `Service.call_many`."""
+    value: Any = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
 
 @dataclass
 class Service:
-    """Use to call one service from another service or from the CLI."""
+    """
+    Use to call one service from another service or from the CLI.
+    Calls are spread across every discovered instance of the service by a load balancer shared within the process.
+    Responses from a `trusted` service are built into `expected_response_cls` without being validated again.
+    """
     name: str
     target_override: Optional[TargetDescriptor] = None
+    trusted: bool = False
 
     def __hash__(self):
         return hash(self.name)
@@ -25,15 +48,149 @@ class Service:
             return self.target_override
         return TargetHandler.from_env_for_service(self.name)
 
+    @cached_property
+    def balancer(self) -> LoadBalancer:
+        return balancer_for(self.target_descriptor.name, self.name)
+
     def call(self, method: str, path: str, args: dict, expected_response_cls=None):
-        full_path = urljoin(self.url, path)
-        r = request(method, full_path, json=args)
+        from yoyo import clients
+        with self.balancer.use(self.urls) as instance:
+            url = instance.url
+            session = clients.get_session(url)
+            opened, start = clients.connections_opened(session, url), time.perf_counter()
+            try:
+                r = session.request(method, urljoin(url, path), json=args, timeout=clients.settings.timeout)
+            except clients.CONNECTION_ERRORS:
+                self._record(method, path, start, "error")
+                self._forget(instance)
+                raise
+        self._record(method, path, start, str(r.status_code), len(r.request.body or b""), len(r.content),
+                     reused=clients.connections_opened(session, url) == opened)
+        self.balancer.report(instance, r.status_code < 500)
         r.raise_for_status()
-        if expected_response_cls is None:
-            return r.json()
-        return expected_response_cls.parse_object(r.json())
+        return self._parse_response(r.content, expected_response_cls)
 
-    @cached_property
+    def stream(self, method: str, path: str, args: dict, expected_response_cls=None) -> Iterator[Any]:
+        """Call an endpoint returning a JSON array, yielding its items as they arrive."""
+        from yoyo import clients, decoding
+        with self.balancer.use(self.urls) as instance:
+            url = instance.url
+            session = clients.get_session(url)
+            opened, start = clients.connections_opened(session, url), time.perf_counter()
+            try:
+                r = session.request(
+                    method, urljoin(url, path), json=args, timeout=clients.settings.timeout, stream=True
+                )
+            except clients.CONNECTION_ERRORS:
+                self._record(method, path, start, "error")
+                self._forget(instance)
+                raise
+            self.balancer.report(instance, r.status_code < 500)
+            parser, build = decoding.JsonArrayParser(), decoding.item_builder(expected_response_cls, self.trusted)
+            reused, received = clients.connections_opened(session, url) == opened, 0
+            with r:
+                try:
+                    r.raise_for_status()
+                    for chunk in r.iter_content(STREAM_CHUNK_SIZE):
+                        received += len(chunk)
+                        yield from map(build, parser.feed(chunk))
+                    yield from map(build, parser.close())
+                finally:
+                    self._record(
+                        method, path, start, str(r.status_code), len(r.request.body or b""), received, reused
+                    )
+
+    async def acall(self, method: str, path: str, args: dict, expected_response_cls=None):
+        from yoyo import clients
+        with self.balancer.use(self.urls) as instance:
+            url = instance.url
+            client = clients.get_async_client(url)
+            start = time.perf_counter()
+            try:
+                r = await client.request(method, urljoin(url, path), json=args)
+            except clients.CONNECTION_ERRORS:
+                self._record(method, path, start, "error")
+                self._forget(instance)
+                raise
+        self._record(method, path, start, str(r.status_code), len(r.request.content), len(r.content),
+                     reused=not new if (new := clients.is_new_connection(r)) is not None else None)
+        self.balancer.report(instance, r.status_code < 500)
+        r.raise_for_status()
+        return self._parse_response(r.content, expected_response_cls)
+
+    async def astream(self, method: str, path: str, args: dict, expected_response_cls=None) -> AsyncIterator[Any]:
+        """Async `stream`."""
+        from yoyo import clients, decoding
+        parser, build = decoding.JsonArrayParser(), decoding.item_builder(expected_response_cls, self.trusted)
+        with self.balancer.use(self.urls) as instance:
+            url = instance.url
+            client = clients.get_async_client(url)
+            start, status, received = time.perf_counter(), "error", 0
+            try:
+                async with client.stream(method, urljoin(url, path), json=args) as r:
+                    status = str(r.status_code)
+                    self.balancer.report(instance, r.status_code < 500)
+                    r.raise_for_status()
+                    async for chunk in r.aiter_bytes(STREAM_CHUNK_SIZE):
+                        received += len(chunk)
+                        for item in parser.feed(chunk):
+                            yield build(item)
+            except clients.CONNECTION_ERRORS:
+                self._forget(instance)
+                raise
+            finally:
+                self._record(method, path, start, status, response_bytes=received)
+        for item in parser.close():
+            yield build(item)
+
+    def call_many(self, calls: Iterable[Call], expected_response_cls=None, concurrency: int = 10) -> List[CallResult]:
+        """Blocking wrapper around `acall_many`, run on a background event loop shared by every sync caller."""
+        from yoyo import clients
+        return clients.run_in_background(self.acall_many(calls, expected_response_cls, concurrency))
+
+    async def acall_many(self, calls: Iterable[Call], expected_response_cls=None,
+                         concurrency: int = 10) -> List[CallResult]:
+        """
+        Make (method, path, args) calls concurrently, at most `concurrency` at a time.
+        Results are returned in the order of `calls`, failures are reported per call.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call_one(method, path, args):
+            async with semaphore:
+                try:
+                    return CallResult(value=await self.acall(method, path, args, expected_response_cls))
+                except Exception as e:
+                    logger.debug(f"Call to '{self.name}' failed: {method} {path}: {e!r}")
+                    return CallResult(error=e)
+
+        return list(await asyncio.gather(*(call_one(*call) for call in calls)))
+
+    def _record(self, method: str, path: str, start: float, status: str, request_bytes: int = 0,
+                response_bytes: int = 0, reused: Optional[bool] = None):
+        from yoyo.metrics import metrics
+        metrics.record(self.name, method, path, time.perf_counter() - start, status, request_bytes, response_bytes,
+                       reused)
+
+    def _parse_response(self, raw: bytes, expected_response_cls=None):
+        from yoyo import decoding
+        return decoding.parse(raw, expected_response_cls, self.trusted)
+
+    @property
+    def urls(self) -> Tuple[str, ...]:
+        """URLs of every discovered instance, refreshed once the discovery cache expires or an instance fails."""
+        return discovery_cache.get(self.target_descriptor, self.name)
+
+    @property
     def url(self) -> str:
-        logger.debug(f"Discovering service '{self.name}'...")
-        return self.target_descriptor.discover(self.name)
+        """URL of the instance the next call would be sent to."""
+        self.balancer.update(self.urls)
+        return self.balancer.pick().url
+
+    def _forget(self, instance: Instance):
+        """Instance is unreachable, eject it and rediscover the service's instances on the next call."""
+        from yoyo import clients
+        logger.debug(f"Connection to '{self.name}' at {instance.url} failed, invalidating discovery.")
+        self.balancer.eject(instance)
+        discovery_cache.invalidate(self.target_descriptor, self.name)
+        clients.close_session(instance.url)
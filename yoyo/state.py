@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+def read_json(path: Path) -> Any:
+    """Contents of a state file, empty if it's missing or was never fully written."""
+    try:
+        return json.loads(path.read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def write_json(path: Path, content: Any, indent: Optional[int] = 2):
+    """Write through a temporary file replacing `path`, so readers only ever see a whole file."""
+    path.parent.mkdir(exist_ok=True, parents=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(content, indent=indent))
+    os.replace(tmp, path)
+
+
+@dataclass
+class JsonState:
+    """An entry per service kept in one JSON file, recorded under a lock as services are built concurrently."""
+    path: Path
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def read(self) -> Dict[str, dict]:
+        return read_json(self.path)
+
+    def get(self, service: str) -> Optional[dict]:
+        return self.read().get(service)
+
+    def set(self, service: str, entry: dict):
+        with self._lock:
+            state = self.read()
+            state[service] = entry
+            write_json(self.path, state)
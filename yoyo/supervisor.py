@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import os
+import resource
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from functools import cache
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from loguru import logger
+from yoyo.config import SupervisorSettings
+from yoyo.registry import service_of
+
+POLL_INTERVAL = 0.5
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+MB = 1024 * 1024
+
+
+@dataclass(frozen=True, eq=True)
+class ResourceLimits:
+    """
+    Caps on a service's processes, set per service (or for all with '*') under `supervisor.limits` in yoyo.yml.
+    Memory is capped by a cgroup where one can be created, and the supervisor also kills services whose sampled RSS
+    goes over it.
+    """
+    memory_mb: Optional[int] = None
+    cpu_seconds: Optional[int] = None
+    open_files: Optional[int] = None
+
+    @classmethod
+    def for_service(cls, settings: SupervisorSettings, service: str) -> ResourceLimits:
+        return cls(**settings.limits.get(service, settings.limits.get("*", {})))
+
+    def apply(self, name: str, pid: int) -> Optional[Path]:
+        """Apply the limits to a process just launched, returning the memory cgroup it was moved into if any."""
+        for limit, value in ((resource.RLIMIT_CPU, self.cpu_seconds), (resource.RLIMIT_NOFILE, self.open_files)):
+            if not value:
+                continue
+            try:
+                _, hard = resource.prlimit(pid, limit)
+                resource.prlimit(pid, limit, (value if hard == resource.RLIM_INFINITY else min(value, hard), hard))
+            except OSError as e:
+                logger.warning(f"Couldn't limit '{name}' (PID: {pid}): {e}")
+        if not self.memory_mb or (group := memory_cgroup(name, self.memory_mb * MB)) is None:
+            return None
+        try:
+            (group / "cgroup.procs").write_text(str(pid))
+        except OSError:
+            remove_cgroup(group)
+            return None
+        return group
+
+
+@cache
+def cgroup_parent() -> Optional[Path]:
+    """
+    Our own cgroup v2 group, if delegated to us, set up to hold a memory limited group per service.
+    Only a group without processes of its own can enable controllers for its children, so yoyo first moves itself
+    into a leaf group of its own. That's only done when yoyo is the group's sole process, and undone if the memory
+    controller still can't be enabled.
+    """
+    try:
+        own = Path("/proc/self/cgroup").read_text()
+    except OSError:
+        return None
+    relative = next((line[3:] for line in own.splitlines() if line.startswith("0::")), None)
+    if relative is None:
+        return None
+    parent = CGROUP_ROOT / relative.strip().lstrip("/")
+    try:
+        if "memory" not in (parent / "cgroup.controllers").read_text().split():
+            return None
+        if (parent / "cgroup.procs").read_text().split() != [str(os.getpid())]:
+            return None
+    except OSError:
+        return None
+    leaf = parent / "yoyo"
+    try:
+        leaf.mkdir(exist_ok=True)
+        (leaf / "cgroup.procs").write_text(str(os.getpid()))
+    except OSError:
+        remove_cgroup(leaf)
+        return None
+    try:
+        (parent / "cgroup.subtree_control").write_text("+memory")
+    except OSError:
+        try:
+            (parent / "cgroup.procs").write_text(str(os.getpid()))
+        except OSError as e:
+            logger.warning(f"Couldn't move yoyo back out of '{leaf}': {e}")
+        remove_cgroup(leaf)
+        return None
+    return parent
+
+
+def memory_cgroup(name: str, limit: int) -> Optional[Path]:
+    """A cgroup v2 group with `memory.max` set, or None where that isn't possible."""
+    if (parent := cgroup_parent()) is None:
+        return None
+    group = parent / f"yoyo-{name}"
+    try:
+        group.mkdir(exist_ok=True)
+        (group / "memory.max").write_text(str(limit))
+    except OSError:
+        remove_cgroup(group)
+        return None
+    return group
+
+
+def remove_cgroup(group: Path):
+    """Remove a group once its processes have exited, it's reused if still busy."""
+    try:
+        group.rmdir()
+    except OSError:
+        pass
+
+
+class ProcessSampler:
+    """CPU and RSS of process trees, keeping psutil handles between samples so CPU percentages are meaningful."""
+
+    def __init__(self):
+        self._handles = {}
+
+    def sample(self, pids: Iterable[int]) -> Dict[int, Tuple[float, int]]:
+        import psutil
+        samples, seen = {}, {}
+        for pid in pids:
+            try:
+                tree = [self._handles.get(pid) or psutil.Process(pid)]
+                tree += [self._handles.get(child.pid, child) for child in tree[0].children(recursive=True)]
+                cpu, rss = 0.0, 0
+                for process in tree:
+                    seen[process.pid] = process
+                    cpu += process.cpu_percent()
+                    rss += process.memory_info().rss
+            except psutil.Error:
+                continue
+            samples[pid] = cpu, rss
+        self._handles = seen
+        return samples
+
+
+@dataclass
+class ServiceStats:
+    service: str
+    pid: int
+    cpu_percent: float
+    rss: int
+    restarts: int
+    uptime: float
+
+
+@dataclass
+class _Supervised:
+    started: float
+    restarts: int = 0
+    backoff: float = 0
+    restart_at: Optional[float] = None
+
+
+class Supervisor:
+    """
+    Watches the processes a LocalStack launches, restarting them with exponential backoff when they exit and
+    sampling their CPU and memory use. Each replica of a service is supervised separately, under its own name.
+    """
+
+    def __init__(self, stack, settings: SupervisorSettings):
+        self.stack = stack
+        self.settings = settings
+        self.stats: Dict[str, ServiceStats] = {}
+        self._states: Dict[str, _Supervised] = {}
+        self._sampler = ProcessSampler()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def watch(self, service: str):
+        with self._lock:
+            state = self._states.setdefault(service, _Supervised(started=time.monotonic()))
+            state.started, state.restart_at = time.monotonic(), None
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="yoyo-supervisor", daemon=True)
+                self._thread.start()
+
+    def forget(self, service: str):
+        with self._lock:
+            self._states.pop(service, None)
+            self.stats.pop(service, None)
+
+    def restarts(self, service: str) -> int:
+        state = self._states.get(service)
+        return state.restarts if state is not None else 0
+
+    def wait(self):
+        """Block until no service is supervised any more."""
+        while (thread := self._thread) is not None:
+            thread.join()
+
+    def _run(self):
+        last_sample = 0.0
+        while True:
+            with self._lock:
+                if not self._states:
+                    self._thread = None
+                    return
+            now = time.monotonic()
+            for service in list(self._states):
+                self._check(service, now)
+            if now - last_sample >= self.settings.sample_interval:
+                self._sample()
+                last_sample = now
+            time.sleep(POLL_INTERVAL)
+
+    def _check(self, service: str, now: float):
+        state, process = self._states.get(service), self.stack.processes.get(service)
+        if state is None or process is None or process.poll() is None:
+            return
+        if state.restart_at is None:
+            self._schedule_restart(service, state, process, now)
+        elif now >= state.restart_at:
+            state.restarts += 1
+            try:
+                self.stack.restart(service, process)
+            except Exception as e:
+                logger.error(f"❌ Failed to restart '{service}': {e}")
+                self._schedule_restart(service, state, process, now)
+                return
+            self.stack.registry.update(service, restarts=state.restarts)
+
+    def _schedule_restart(self, service: str, state: _Supervised, process: subprocess.Popen, now: float):
+        settings = self.settings
+        if not settings.restart or (settings.max_restarts is not None and state.restarts >= settings.max_restarts):
+            logger.error(f"💀 '{service}' exited with code {process.returncode}, not restarting it.")
+            self.forget(service)
+            return
+        if not state.backoff or now - state.started >= settings.backoff_reset:
+            state.backoff = settings.backoff_initial
+        else:
+            state.backoff = min(state.backoff * 2, settings.backoff_max)
+        state.restart_at = now + state.backoff
+        logger.warning(f"💥 '{service}' exited with code {process.returncode}, restarting in {state.backoff:.1f}s...")
+
+    def _sample(self):
+        running = {
+            service: process for service in list(self._states)
+            if (process := self.stack.processes.get(service)) is not None and process.poll() is None
+        }
+        samples = self._sampler.sample(process.pid for process in running.values())
+        now = time.monotonic()
+        for service, process in running.items():
+            if process.pid not in samples or (state := self._states.get(service)) is None:
+                continue
+            cpu, rss = samples[process.pid]
+            self.stats[service] = ServiceStats(service, process.pid, cpu, rss, state.restarts, now - state.started)
+            limit = ResourceLimits.for_service(self.settings, service_of(service)).memory_mb
+            if limit and rss > limit * MB:
+                logger.warning(f"🐘 '{service}' is using {rss // MB}MB, over its {limit}MB limit, killing it.")
+                process.kill()
+
+
+def format_table(stats: Iterable[ServiceStats]) -> str:
+    rows = [("SERVICE", "PID", "CPU%", "RSS", "RESTARTS", "UPTIME")]
+    for s in sorted(stats, key=lambda s: s.cpu_percent, reverse=True):
+        rows.append((s.service, str(s.pid), f"{s.cpu_percent:.1f}", f"{s.rss / MB:.1f}MB", str(s.restarts),
+                     format_duration(s.uptime)))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows)
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}" if hours else f"{minutes}:{seconds:02}"
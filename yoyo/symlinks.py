@@ -1,35 +1,134 @@
-from dataclasses import dataclass
-from typing import Tuple, Iterable, Set
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Set, Tuple
 
 from loguru import logger
 from yoyo.exceptions import ServiceNotFound
-from yoyo.path_mapper import PathMap
+from yoyo.path_mapper import PathMap, is_service_entry
+
+Link = Tuple[str, str]
+
+
+@dataclass
+class SymlinkPlan:
+    """What reconciling the symlinks with the graph would change."""
+    create: Set[Link] = field(default_factory=set)
+    repair: Set[Link] = field(default_factory=set)
+    delete: Set[Link] = field(default_factory=set)
+
+    def __bool__(self):
+        return bool(self.create or self.repair or self.delete)
+
+    def describe(self):
+        for caller, callee in sorted(self.create):
+            logger.info(f"✨ Create link: {caller} ➡️ {callee}")
+        for caller, callee in sorted(self.repair):
+            logger.info(f"🔧 Repair link: {caller} ➡️ {callee}")
+        for caller, callee in sorted(self.delete):
+            logger.info(f"🗑 Delete link: {caller} ❌ {callee}")
+        if not self:
+            logger.info("👌 Symlinks are up to date.")
 
 
 @dataclass
 class ServiceSymlinkManager:
     path_map: PathMap
 
-    def get_existing_symlinks(self) -> Set[Tuple[str, str]]:
+    def get_existing_symlinks(self) -> Set[Link]:
         return set(
-            (caller.name, callee.name)
-            for caller in self.path_map.service_dirs
-            for callee in self.path_map.get_linked_dirs(caller)
+            (caller, callee)
+            for caller, links in self.scan().items()
+            for callee in links
         )
 
-    def link_services(self, links: Iterable[Tuple[str, str]]):
-        for (caller, callee) in links:
-            logger.info(f"✨ Creating link: {caller} ➡️ {callee}")
-            callee_models = self.path_map.models_dir(callee)
+    def scan(self) -> Dict[str, Dict[str, Optional[str]]]:
+        """Each service's links as callee -> resolved link target, None for entries that aren't symlinks."""
+        links = {}
+        with os.scandir(self.path_map.services_dir) as services:
+            for service in services:
+                if not is_service_entry(service):
+                    continue
+                links[service.name] = {}
+                try:
+                    with os.scandir(self.path_map.links_dir(service.name)) as entries:
+                        for entry in entries:
+                            if entry.is_symlink():
+                                links[service.name][entry.name] = os.path.realpath(entry.path)
+                            elif entry.is_dir():
+                                links[service.name][entry.name] = None
+                except (FileNotFoundError, NotADirectoryError):
+                    pass
+        return links
+
+    def plan(self, edges: Iterable[Link]) -> SymlinkPlan:
+        existing = self.scan()
+        plan = SymlinkPlan()
+        expected_targets = {}
+        for caller, callee in edges:
+            if callee not in expected_targets:
+                models = self.path_map.models_dir(callee)
+                if not models.is_dir():
+                    raise ServiceNotFound(f"Service '{caller}' references service '{callee}' which does not exist.")
+                expected_targets[callee] = os.path.realpath(models)
+            links = existing.get(caller, {})
+            if callee not in links:
+                plan.create.add((caller, callee))
+            elif links[callee] is None:
+                logger.warning(f"'{self.path_map.links_dir(caller) / callee}' isn't a symlink, leaving it alone.")
+            elif links[callee] != expected_targets[callee]:
+                plan.repair.add((caller, callee))
+        edges = set(edges)
+        plan.delete = set(
+            (caller, callee)
+            for caller, links in existing.items()
+            for callee, target in links.items()
+            if target is not None and (caller, callee) not in edges
+        )
+        return plan
+
+    def apply(self, plan: SymlinkPlan):
+        for caller, callee in plan.create:
             links_dir = self.path_map.links_dir(caller)
             links_dir.mkdir(exist_ok=True, parents=True)
-            caller_link_path = self.path_map.make_relative(links_dir) / callee
-            if not callee_models.exists():
-                raise ServiceNotFound(f"Service '{caller}' references service '{callee}' which does not exist.")
-            caller_link_path.symlink_to(callee_models, target_is_directory=True)
-
-    def unlink_services(self, links: Iterable[Tuple[str, str]]):
-        for (caller, callee) in links:
-            logger.info(f"🗑 Deleting link: {caller} ❌ {callee}")
-            caller_link_path = self.path_map.links_dir(caller) / callee
-            caller_link_path.unlink()
+            os.symlink(self.path_map.models_dir(callee), links_dir / callee, target_is_directory=True)
+        for caller, callee in plan.repair:
+            link = self.path_map.links_dir(caller) / callee
+            tmp = link.with_name(f".{callee}.yoyo-tmp")
+            tmp.unlink(missing_ok=True)
+            os.symlink(self.path_map.models_dir(callee), tmp, target_is_directory=True)
+            os.replace(tmp, link)
+        for caller, callee in plan.delete:
+            os.unlink(self.path_map.links_dir(caller) / callee)
+
+    def reconcile(self, graph, dry_run: bool = False, force: bool = False) -> Optional[SymlinkPlan]:
+        """
+        Make every service's symlinks match the graph's edges, creating missing links, repointing stale or broken
+        ones and deleting those no longer needed. Skipped when the graph hasn't changed since it last succeeded,
+        unless forced; a dry run only logs the plan.
+        """
+        digest = self.digest(graph)
+        if not (dry_run or force) and self.last_digest() == digest:
+            logger.info("👌 Graph unchanged since symlinks were last reconciled, skipping.")
+            return None
+        plan = self.plan(graph.edges)
+        plan.describe()
+        if dry_run:
+            return plan
+        self.apply(plan)
+        state_file = self.path_map.symlink_state_file
+        state_file.parent.mkdir(exist_ok=True, parents=True)
+        state_file.write_text(json.dumps({"graph": digest}))
+        return plan
+
+    def digest(self, graph) -> str:
+        """The graph's digest, salted with where the services are since links point there."""
+        return f"{graph.digest}:{self.path_map.services_dir}"
+
+    def last_digest(self) -> Optional[str]:
+        try:
+            return json.loads(self.path_map.symlink_state_file.read_text())['graph']
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
@@ -1,7 +1,10 @@
+import os
 from abc import abstractmethod
+from pathlib import Path
 from typing import Optional
 
 from yoyo.cli import CLI
+from yoyo.registry import SERVICE_REGISTRY_ENV_VAR
 from yoyo.service import Service
 from yoyo.targets.target_handler import TargetHandler
 
@@ -17,9 +20,32 @@ class TargetCmds(CLI):
         """
         Call a service at the given target.
         """
+        os.environ.setdefault(SERVICE_REGISTRY_ENV_VAR, str(self._absolute_paths.registry_file))
         target = TargetHandler.from_cli_for_service(self, service)
         return Service(service, target_override=target).call(method, path, args)
 
+    def bench(self, service: str = None, method: str = None, path: str = None, args: Optional[dict] = None,
+              concurrency: int = 10, rate: Optional[float] = None, duration: float = 10, warmup: float = 1,
+              spec: Optional[str] = None, baseline: Optional[str] = None):
+        """
+        Benchmark an endpoint of a service at the given target, or every endpoint in a --spec file.
+        Runs closed loop at --concurrency, or open loop at a fixed --rate of requests per second.
+        Results are saved under the generated dir, --baseline compares them with a result file or 'last' run.
+        """
+        from yoyo.bench import BenchSpec, bench, load_specs
+        os.environ.setdefault(SERVICE_REGISTRY_ENV_VAR, str(self._absolute_paths.registry_file))
+        if spec:
+            specs = load_specs(Path(spec))
+        elif not (service and method and path):
+            raise ValueError("Pass --service, --method and --path to benchmark an endpoint, or a --spec file.")
+        else:
+            specs = [BenchSpec(service, method, path, args, concurrency, rate, duration, warmup)]
+
+        def discover(name):
+            return Service(name, target_override=TargetHandler.from_cli_for_service(self, name)).urls
+
+        bench(specs, discover, self._absolute_paths.bench_dir, baseline)
+
     def _get_service_target_overrides(self):
         """
         Target overriding not supported yet so just return same target.
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import codecs
+import inspect
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from loguru import logger
+from yoyo.build_context import BuildContext, FileHashes, DOCKERFILE
+from yoyo.config import CloudRunSettings
+from yoyo.exceptions import ImageBuildFailed
+from yoyo.path_mapper import PathMap
+from yoyo.state import JsonState
+
+
+def docker_client():
+    """One API client shared by every build, from the `docker` SDK where installed, docker-py 1.x otherwise."""
+    try:
+        from docker import APIClient
+        return APIClient(version='auto')
+    except ImportError:
+        from docker import AutoVersionClient
+        return AutoVersionClient()
+
+
+class BuildStreamParser:
+    """
+    Incremental parser for the JSON objects streamed back by a docker build.
+    Chunks can split objects, and multi-byte characters, anywhere, and may hold several objects.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ""
+
+    def feed(self, chunk: bytes) -> Iterator[dict]:
+        self._buffer += self._utf8.decode(chunk)
+        pos = 0
+        while True:
+            while pos < len(self._buffer) and self._buffer[pos].isspace():
+                pos += 1
+            try:
+                obj, pos = self._decoder.raw_decode(self._buffer, pos)
+            except json.JSONDecodeError:
+                break
+            yield obj
+        self._buffer = self._buffer[pos:]
+
+    def close(self):
+        if rest := (self._buffer + self._utf8.decode(b"", final=True)).strip():
+            raise ImageBuildFailed(f"Build output ended mid-message: {rest[:200]!r}")
+
+
+class ImageState(JsonState):
+    """Build context digest of each service's last successfully built image, used to skip unchanged builds."""
+
+    def record(self, service: str, tag: str, digest: str):
+        self.set(service, {"tag": tag, "context": digest})
+
+
+class ImageBuilder:
+    """
+    Builds service images concurrently through one docker client, each from its minimal build context.
+    Any object with docker-py's `build` and `inspect_image` will do as the client, so a fake can stand in for it.
+    """
+
+    def __init__(self, client, path_map: PathMap, graph, settings: CloudRunSettings = CloudRunSettings()):
+        self.client = client
+        self.path_map = path_map
+        self.graph = graph
+        self.settings = settings
+        self.state = ImageState(path_map.image_state_file)
+        self.hashes = FileHashes(path_map.file_hashes_file)
+        self._supports_cache_from = "cache_from" in inspect.signature(client.build).parameters
+
+    def tag(self, service: str) -> str:
+        return f"{self.settings.registry}/{service}"
+
+    @property
+    def dockerfile(self) -> Path:
+        return self.path_map.root / self.settings.dockerfile
+
+    def build_many(self, services: Iterable[str], workers: Optional[int] = None,
+                   force=False) -> Dict[str, Optional[Exception]]:
+        """Build images `workers` at a time, returning each service's error or None if it built or was skipped."""
+        services = list(services)
+        if not services:
+            return {}
+        results = {}
+        with ThreadPoolExecutor(max_workers=workers or self.settings.build_workers) as executor:
+            futures = {executor.submit(self.build, service, force): service for service in services}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    results[futures[future]] = None
+                except Exception as e:
+                    results[futures[future]] = e
+        self.hashes.save()
+        return results
+
+    def context(self, service: str) -> BuildContext:
+        return BuildContext.for_service(self.path_map, self.graph, service, self.dockerfile, self.hashes)
+
+    def build(self, service: str, force=False) -> bool:
+        """Build the service's image unless its context is unchanged since the last build, returns whether it built."""
+        tag = self.tag(service)
+        context = self.context(service)
+        digest = context.digest()
+        cached = self.state.get(service)
+        if not force and cached and cached == {"tag": tag, "context": digest} and self.image_exists(tag):
+            logger.info(f"♻️ Image for '{service}' is up to date, skipping build.")
+            return False
+        logger.info(f"🐳 Building '{service}'...")
+        kwargs = {}
+        if self.settings.cache_from and self._supports_cache_from:
+            kwargs['cache_from'] = [tag]
+        logger.debug(f"[{service}] Build context: {len(context.files)} file(s), digest {digest[:12]}.")
+        with context.tar() as fileobj:
+            output = self.client.build(
+                fileobj=fileobj, custom_context=True, tag=tag, dockerfile=DOCKERFILE, rm=True, **kwargs
+            )
+            self.log_output(service, output)
+        self.state.record(service, tag, digest)
+        logger.info(f"✅ Built '{tag}'.")
+        return True
+
+    def image_exists(self, tag: str) -> bool:
+        """Whether the image is still there to reuse, anything that stops us checking means rebuilding."""
+        try:
+            self.client.inspect_image(tag)
+        except Exception:
+            return False
+        return True
+
+    @staticmethod
+    def log_output(service: str, output: Iterable[bytes]):
+        parser = BuildStreamParser()
+        errors: List[str] = []
+        for chunk in output:
+            for log in parser.feed(chunk):
+                if stream := log.get('stream'):
+                    logger.debug(f"[{service}] {stream.strip()}")
+                if error := log.get('errorDetail'):
+                    errors.append(error['message'].strip())
+                    logger.error(f"[{service}] {errors[-1]}")
+        parser.close()
+        if errors:
+            raise ImageBuildFailed(f"Failed to build '{service}': {errors[-1]}")
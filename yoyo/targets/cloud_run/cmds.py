@@ -1,35 +1,22 @@
-import json
-
-from docker import AutoVersionClient
 from loguru import logger
+from yoyo.exceptions import ImageBuildFailed
 from yoyo.targets.base.cmds import TargetCmds
-from yoyo.utils import cd_python
+from yoyo.targets.cloud_run.builds import ImageBuilder, docker_client
 
 
 class CloudRunCmds(TargetCmds):
-    def up(self):
-        """Run service locally"""
-        for service in self.services:
-            # docker build -t gcr.io/query-router/client-config-store .
-            # docker push gcr.io/query-router/client-config-store
-            # gcloud run deploy client-config-store \
-            # 		--image gcr.io/query-router/client-config-store \
-            # 		--platform managed \
-            # 		--region europe-west1
-            logger.info(f"Building '{service}'...")
-            client = AutoVersionClient()
-            output = client.build(
-                path=str(self._absolute_paths.service_dir(service)),
-                tag=f'gcr.io/query-router/{service}',
-                dockerfile=str(self._absolute_paths.root / 'services/Dockerfile')
-            )
-            for lines in output:
-                for line in str(lines, 'utf-8').split('\n'):
-                    line = line.strip(" \r")
-                    if not line:
-                        continue
-                    log = json.loads(line)
-                    if stream := log.get('stream', None):
-                        logger.debug(stream.strip('\n '))
-                    if error := log.get('errorDetail', None):
-                        logger.error(error['message'].strip('\n '))
+    def up(self, build_workers: int = None, force: bool = False):
+        """Build service images concurrently, skipping those whose build context hasn't changed"""
+        # docker push gcr.io/query-router/client-config-store
+        # gcloud run deploy client-config-store \
+        # 		--image gcr.io/query-router/client-config-store \
+        # 		--platform managed \
+        # 		--region europe-west1
+        builder = ImageBuilder(docker_client(), self._absolute_paths, self._graph, self._config.cloud_run)
+        results = builder.build_many(self.services, build_workers, force)
+        failures = {service: error for service, error in results.items() if error is not None}
+        if failures:
+            logger.error(f"❌ Failed to build {len(failures)} image(s):")
+            for service, error in sorted(failures.items()):
+                logger.error(f" • {service}: {error}")
+            raise ImageBuildFailed(f"Failed to build: {', '.join(sorted(failures))}.")
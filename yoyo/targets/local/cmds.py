@@ -1,29 +1,71 @@
-from yoyo.exceptions import ServiceNotExecutable
+import time
+
+from yoyo.daemon import Daemon
+from yoyo.exceptions import VirtualenvBuildFailed
+from yoyo.registry import ServiceRegistry, service_of, stop_registered
+from yoyo.supervisor import ProcessSampler, ServiceStats, format_table
 from yoyo.targets.base.cmds import TargetCmds
-from yoyo.targets.target_handler import TargetHandler
-from yoyo.utils import build_virtualenv, run_cmd, stream_multiple_processes, find_free_port
+from yoyo.targets.local.stack import LocalStack
+from yoyo.utils import get_colours
+from yoyo.venvs import build_virtualenvs, log_build_failures, DEFAULT_BUILD_WORKERS
+from yoyo.watch import ServiceWatcher
 
 
 class LocalCmds(TargetCmds):
-    def up(self):
-        """Run service locally"""
-        processes = []
-        for service in self.services:
-            service_path = self._absolute_paths.service_dir(service)
-            if not self._absolute_paths.main_file(service).exists():
-                raise ServiceNotExecutable(f"No main.py found for service '{service}'.")
+    def up(self, build_workers: int = DEFAULT_BUILD_WORKERS, grep: str = None, watch: bool = False):
+        """
+        Run services locally, callees first, each wave starting once the previous one is ready.
+        With --watch, services are reloaded as their files change.
+        """
+        stack = LocalStack(self, grep=grep)
+        stack.start(self.services, build_workers)
+        if not stack.processes:
+            raise VirtualenvBuildFailed("No services could be started.")
+        try:
+            if watch:
+                ServiceWatcher(self, stack, self._config.watch).run()
+            else:
+                stack.wait()
+        except KeyboardInterrupt:
+            pass
+        stack.stop_all()
 
-            with build_virtualenv(service_path) as env:
-                TargetHandler.to_env_from_cli(self, env)
-                port = str(find_free_port())
-                cmd = f"uvicorn --app-dir {str(service_path)} main:app --host 0.0.0.0 --port {port}"
-                processes.append((service, run_cmd(cmd, env=env)))
+    def down(self):
+        """Stop locally running services found in the registry"""
+        registry = ServiceRegistry(self._absolute_paths.registry_file)
+        for service in self.services:
+            stop_registered(registry, service)
 
-        stream_multiple_processes(processes)
+    def top(self, interval: float = 2, once: bool = False):
+        """Live CPU, memory and restart counts of locally running services found in the registry"""
+        registry = ServiceRegistry(self._absolute_paths.registry_file)
+        sampler = ProcessSampler()
+        while True:
+            entries = {name: e for name, e in registry.read().items() if service_of(name, e) in self.services}
+            samples = sampler.sample(entry['pid'] for entry in entries.values())
+            stats = [
+                ServiceStats(name, entry['pid'], *samples[entry['pid']], entry.get('restarts', 0),
+                             time.time() - entry.get('started', time.time()))
+                for name, entry in entries.items() if entry['pid'] in samples
+            ]
+            if once:
+                print(format_table(stats))
+                return
+            print("\x1b[2J\x1b[H" + format_table(stats), flush=True)
+            try:
+                time.sleep(interval)
+            except KeyboardInterrupt:
+                return
 
-    def rebuild(self):
+    def rebuild(self, build_workers: int = DEFAULT_BUILD_WORKERS):
         """Force rebuild venvs"""
-        for service in self.services:
-            service_path = self._absolute_paths.service_dir(service)
-            with build_virtualenv(service_path, force=True):
-                pass
+        colours = get_colours(self.services)
+        builds = build_virtualenvs(self._absolute_paths, self.services, colours, build_workers, force=True)
+        failures = {service: error for service, _, error in builds if error is not None}
+        log_build_failures(failures)
+        if failures:
+            raise VirtualenvBuildFailed(f"Failed to rebuild: {', '.join(sorted(failures))}.")
+
+    def daemon(self):
+        """Run a long-lived yoyo daemon for this repo, `yy` commands are then forwarded to it"""
+        Daemon(self).serve()
@@ -1,14 +1,25 @@
+from typing import List
+
 from loguru import logger
+from yoyo.registry import ServiceRegistry
 from yoyo.utils import search_processes, extract_port_from_cmd
 
 
-def discover_local(service: str) -> str:
+def discover_local(service: str) -> List[str]:
+    """URLs of every running instance of the service, newest first."""
+    registry = ServiceRegistry.from_env()
+    if registry is not None and (entries := registry.instances(service)):
+        pids = ', '.join(str(entry['pid']) for entry in entries.values())
+        logger.debug(f"Found service '{service}' in registry (PIDs: {pids})")
+        return list(dict.fromkeys(local_url(entry['port']) for entry in entries.values()))
     matches = search_processes(['uvicorn', service, '--port'])
     if not len(matches):
         raise RuntimeError(f"Service {service} undiscoverable...")
-    if len(matches) > 1:
-        logger.warning(f"Found more than one instance of '{service}' running, choosing most recent.")
-    proc_info = sorted(matches, key=lambda p: p['create_time'], reverse=True)[0]
-    logger.debug(f"Found service '{service}' (PID: {proc_info['pid']})")
-    port = extract_port_from_cmd(proc_info['cmdline'])
+    matches = sorted(matches, key=lambda p: p['create_time'], reverse=True)
+    logger.debug(f"Found service '{service}' (PIDs: {', '.join(str(p['pid']) for p in matches)})")
+    urls = [local_url(extract_port_from_cmd(proc_info['cmdline'])) for proc_info in matches]
+    return list(dict.fromkeys(urls))
+
+
+def local_url(port) -> str:
     return f"http://0.0.0.0:{port}"
@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import http.client
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from loguru import logger
+from yoyo.config import ScalingSettings
+from yoyo.exceptions import ServiceBlocked, ServiceNotExecutable, ServiceNotReady
+from yoyo.logs import LogMultiplexer
+from yoyo.metrics import METRICS_DIR_ENV_VAR, SERVICE_NAME_ENV_VAR
+from yoyo.ports import PortAllocator
+from yoyo.registry import ServiceRegistry, replica_name, service_of
+from yoyo.supervisor import Supervisor, ResourceLimits, remove_cgroup
+from yoyo.targets.target_handler import TargetHandler
+from yoyo.utils import run_cmd
+from yoyo.venvs import build_virtualenvs, log_build_failures, DEFAULT_BUILD_WORKERS
+
+STOP_TIMEOUT = 10
+PROBE_TIMEOUT = 1
+AUTO = "auto"
+
+
+@dataclass(frozen=True)
+class Scale:
+    """
+    How many uvicorn processes run a service and how many workers each has, set under `scaling` in yoyo.yml with
+    per service overrides. Either can be 'auto': workers then take the available cores left per replica, and
+    replicas those left per worker count. Both being 'auto' means one replica with a worker per core.
+    Values are validated when the config is loaded.
+    """
+    replicas: int = 1
+    workers: int = 1
+
+    @classmethod
+    def for_service(cls, settings: ScalingSettings, service: str) -> Scale:
+        scaling = {"replicas": settings.replicas, "workers": settings.workers, **settings.services.get(service, {})}
+        replicas, workers, cores = scaling["replicas"], scaling["workers"], available_cores()
+        if workers == AUTO:
+            workers = cores if replicas == AUTO else max(1, cores // int(replicas))
+        if replicas == AUTO:
+            replicas = max(1, cores // int(workers))
+        return cls(max(1, int(replicas)), max(1, int(workers)))
+
+    def names(self, service: str) -> List[str]:
+        return [replica_name(service, i, self.replicas) for i in range(self.replicas)]
+
+
+def available_cores() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class LocalStack:
+    """
+    The uvicorn processes started by one `yy up` or `yy daemon`, keyed by name: the service's name, or
+    '<service>#<n>' for each of its replicas. Every process has a port of its own, registered for discovery so
+    callers balance their calls across the replicas.
+    """
+
+    def __init__(self, cli, grep: Optional[str] = None):
+        self.cli = cli
+        self.path_map = cli._absolute_paths
+        self.registry = ServiceRegistry(self.path_map.registry_file)
+        self.allocator = PortAllocator(self.path_map.ports_file)
+        log_settings = cli._config.logs if grep is None else replace(cli._config.logs, grep=grep)
+        log_dir = cli.root_path / log_settings.log_dir if log_settings.log_dir else None
+        self.streamer = LogMultiplexer(sorted(cli._graph.nodes), log_settings, log_dir)
+        self.supervisor = Supervisor(self, cli._config.supervisor)
+        self.processes: Dict[str, subprocess.Popen] = {}
+        self.replicas: Dict[str, List[str]] = {}
+        self.scales: Dict[str, Scale] = {}
+        self.ports: Dict[str, int] = {}
+        self.envs: Dict[str, dict] = {}
+        self.cgroups: Dict[str, Path] = {}
+        self._lock = threading.RLock()
+
+    def start(self, services: Iterable[str], build_workers: int = DEFAULT_BUILD_WORKERS) -> Dict[str, Exception]:
+        """
+        Start services that aren't already running, returning those that failed to build or become ready.
+        Venvs are all built concurrently, but services are launched in dependency waves: a wave is launched as its
+        venvs finish and must pass its readiness checks before any of the next wave's callers are launched.
+        Services calling, directly or not, one that failed to build or become ready are not launched at all.
+        """
+        services = [s for s in services if not self.is_running(s)]
+        for service in services:
+            if not self.path_map.main_file(service).exists():
+                raise ServiceNotExecutable(f"No main.py found for service '{service}'.")
+
+        scales = {service: Scale.for_service(self.cli._config.scaling, service) for service in services}
+        self.allocator.reserve(name for service, scale in scales.items() for name in scale.names(service))
+        waves, cycles = self.cli._graph.waves(services)
+        for cycle in cycles:
+            logger.warning(f"🔁 Services call each other in a cycle, starting them together: {', '.join(sorted(cycle))}")
+
+        build_order = [service for wave in waves for service in wave]
+        builds = build_virtualenvs(self.path_map, build_order, self.streamer.colours, build_workers)
+        built, build_failures, not_ready, blocked = {}, {}, {}, {}
+        for i, wave in enumerate(waves):
+            while not all(s in built or s in build_failures for s in wave):
+                service, env, error = next(builds)
+                if error is not None:
+                    build_failures[service] = error
+                else:
+                    built[service] = env
+            failed = set(build_failures) | set(not_ready)
+            for service in wave:
+                if service in built and (upstream := self.cli._graph.reachable.get(service, set()) & failed):
+                    blocked[service] = ServiceBlocked(
+                        f"'{service}' wasn't started, it calls {', '.join(sorted(upstream))} which failed to start."
+                    )
+            launched = [service for service in wave if service in built and service not in blocked]
+            for service in launched:
+                self.launch_replicas(service, built[service], scales[service])
+            logger.info(f"🌊 Wave {i + 1}/{len(waves)}: waiting for {', '.join(launched) or 'nothing'} to be ready...")
+            not_ready.update(self.wait_until_ready(launched))
+        builds.close()
+        log_build_failures(build_failures)
+        for error in [*not_ready.values(), *blocked.values()]:
+            logger.error(f"❌ {error}")
+        return {**build_failures, **not_ready, **blocked}
+
+    def wait_until_ready(self, services: Iterable[str]) -> Dict[str, ServiceNotReady]:
+        services = list(services)
+        if not services:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(services)) as executor:
+            results = executor.map(self._wait_until_ready, services)
+        return {service: error for service, error in zip(services, results) if error is not None}
+
+    def _wait_until_ready(self, service: str) -> Optional[ServiceNotReady]:
+        settings = self.cli._config.startup
+        waiting = {name: self.processes[name] for name in self.replicas[service]}
+        deadline = time.monotonic() + settings.readiness_timeout
+        while time.monotonic() < deadline:
+            for name, process in list(waiting.items()):
+                if process.poll() is not None:
+                    return ServiceNotReady(f"'{name}' exited with code {process.returncode} before becoming ready.")
+                if is_ready(self.ports[name], settings.readiness_path):
+                    del waiting[name]
+            if not waiting:
+                ports = ', '.join(str(self.ports[name]) for name in self.replicas[service])
+                logger.info(f"✅ '{service}' is ready on port(s) {ports}.")
+                return None
+            time.sleep(settings.poll_interval)
+        return ServiceNotReady(f"'{service}' wasn't ready after {settings.readiness_timeout}s.")
+
+    def launch_replicas(self, service: str, env: dict, scale: Scale) -> List[subprocess.Popen]:
+        if scale != Scale():
+            logger.info(f"📈 Running '{service}' as {scale.replicas} replica(s) of {scale.workers} worker(s).")
+        with self._lock:
+            self.replicas[service] = scale.names(service)
+            self.scales[service] = scale
+        return [self.launch(name, dict(env), scale.workers) for name in scale.names(service)]
+
+    def launch(self, name: str, env: dict, workers: int = 1) -> subprocess.Popen:
+        service = service_of(name)
+        TargetHandler.to_env_from_cli(self.cli, env)
+        self.registry.to_env(env)
+        env[SERVICE_NAME_ENV_VAR] = service
+        env[METRICS_DIR_ENV_VAR] = str(self.path_map.metrics_dir)
+        port, fd = self.allocator.port(name), self.allocator.socket(name).fileno()
+        service_path = self.path_map.service_dir(service)
+        # uvicorn serves the inherited socket, --port is only kept so the command line identifies the service.
+        cmd = f"uvicorn --app-dir {str(service_path)} main:app --host 0.0.0.0 --port {port} --fd {fd}"
+        if workers > 1:
+            cmd += f" --workers {workers}"
+        process = run_cmd(cmd, env=env, pass_fds=(fd,))
+        # Applied from here rather than a preexec_fn, which isn't safe to use from the supervisor's thread.
+        cgroup = ResourceLimits.for_service(self.cli._config.supervisor, service).apply(name, process.pid)
+        with self._lock:
+            self.processes[name] = process
+            self.ports[name] = port
+            self.envs[name] = env
+            if cgroup is not None:
+                self.cgroups[name] = cgroup
+            self.registry.register(name, port, process.pid, service)
+        self.streamer.stream(name, process, service)
+        self.supervisor.watch(name)
+        return process
+
+    def restart(self, name: str, exited: subprocess.Popen):
+        """Relaunch a process that exited, unless it has since been stopped or restarted."""
+        with self._lock:
+            if self.processes.get(name) is not exited:
+                return
+            logger.info(f"🔄 Restarting '{name}'...")
+            self.launch(name, self.envs[name], self.scales[service_of(name)].workers)
+
+    def reload(self, services: Iterable[str]) -> Dict[str, Exception]:
+        """Restart running services, keeping their ports bound so connections queue up rather than being refused."""
+        services = list(services)
+        self.stop(services, release=False)
+        return self.start(services)
+
+    def stop(self, services: Iterable[str], release: bool = True):
+        """Stop every replica of the services, terminating them all before waiting for any to exit."""
+        stopping, cgroups = {}, []
+        for service in services:
+            with self._lock:
+                self.scales.pop(service, None)
+                for name in self.replicas.pop(service, []):
+                    self.supervisor.forget(name)
+                    self.envs.pop(name, None)
+                    self.ports.pop(name, None)
+                    if release:
+                        self.allocator.release(name)
+                    if (cgroup := self.cgroups.pop(name, None)) is not None:
+                        cgroups.append(cgroup)
+                    self.registry.unregister(name)
+                    if (process := self.processes.pop(name, None)) is not None:
+                        stopping[name] = process
+        for name, process in stopping.items():
+            logger.info(f"🛑 Stopping '{name}' (PID: {process.pid})")
+            process.terminate()
+        deadline = time.monotonic() + STOP_TIMEOUT
+        for process in stopping.values():
+            try:
+                process.wait(timeout=max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        for cgroup in cgroups:
+            remove_cgroup(cgroup)
+
+    def stop_all(self):
+        self.stop(list(self.replicas))
+
+    @property
+    def services(self) -> List[str]:
+        return list(self.replicas)
+
+    def is_running(self, service: str) -> bool:
+        return any(
+            (process := self.processes.get(name)) is not None and process.poll() is None
+            for name in self.replicas.get(service, ())
+        )
+
+    def status(self) -> Dict[str, dict]:
+        status = {}
+        with self._lock:
+            processes = sorted(self.processes.items())
+        for name, process in processes:
+            status[name] = {
+                "pid": process.pid, "running": process.poll() is None, "returncode": process.returncode,
+                "restarts": self.supervisor.restarts(name)
+            }
+            if (stats := self.supervisor.stats.get(name)) is not None:
+                status[name].update(cpu_percent=stats.cpu_percent, rss=stats.rss)
+        return status
+
+    def wait(self):
+        """Block until every service has stopped for good, then until its output has been streamed."""
+        self.supervisor.wait()
+        self.streamer.wait()
+
+
+def is_ready(port: int, path: str = "/") -> bool:
+    """
+    Whether the service answers `path` with a non-5xx response. Connecting alone proves nothing, the port's socket
+    is listening from before the service is launched.
+    """
+    try:
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=PROBE_TIMEOUT)
+        try:
+            connection.request("GET", path or "/")
+            return connection.getresponse().status < 500
+        finally:
+            connection.close()
+    except (OSError, http.client.HTTPException):
+        return False
@@ -1,22 +1,31 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Type, Optional, Callable
+from functools import cached_property
+from typing import Type, Optional, Callable, List, Union
 
-from yoyo.targets.base.cmds import TargetCmds
-from yoyo.targets.cloud_run.cmds import CloudRunCmds
-from yoyo.targets.local.cmds import LocalCmds
-from yoyo.targets.local.discovery import discover_local
+from yoyo.utils import import_object
 
 
 @dataclass
 class TargetDescriptor:
+    """Command classes and discovery functions are given as 'module:attr' and only imported when first used."""
     name: str
-    cmds_cls: Optional[Type[TargetCmds]]
-    discovery_func: Optional[Callable[[str], str]]
+    cmds_path: Optional[str]
+    discovery_path: Optional[str]
 
-    def discover(self, service: str):
-        return self.discovery_func(service)
+    @cached_property
+    def cmds_cls(self) -> Optional[Type[TargetCmds]]:
+        return import_object(self.cmds_path) if self.cmds_path else None
+
+    @cached_property
+    def discovery_func(self) -> Optional[Callable[[str], Union[str, List[str]]]]:
+        return import_object(self.discovery_path) if self.discovery_path else None
+
+    def discover(self, service: str) -> List[str]:
+        """URLs of the service's instances, discovery functions may return a list of them or a single one."""
+        urls = self.discovery_func(service)
+        return [urls] if isinstance(urls, str) else list(urls)
 
     def add_target_commands_to_cli(self, cli):
         cli.__class__ = self.cmds_cls
@@ -24,20 +33,20 @@ class TargetDescriptor:
 
 null = TargetDescriptor(
     name='null',
-    cmds_cls=None,
-    discovery_func=None
+    cmds_path=None,
+    discovery_path=None
 )
 
 local = TargetDescriptor(
     name='local',
-    cmds_cls=LocalCmds,
-    discovery_func=discover_local
+    cmds_path='yoyo.targets.local.cmds:LocalCmds',
+    discovery_path='yoyo.targets.local.discovery:discover_local'
 )
 
 cloud_run = TargetDescriptor(
     name='cloud_run',
-    cmds_cls=CloudRunCmds,
-    discovery_func=discover_local
+    cmds_path='yoyo.targets.cloud_run.cmds:CloudRunCmds',
+    discovery_path='yoyo.targets.local.discovery:discover_local'
 )
 
 target_descriptor_lookup = {k: v for k, v in locals().items() if isinstance(v, TargetDescriptor)}
@@ -1,21 +1,20 @@
 import colorsys
 import contextlib
-import importlib
+import importlib.util
 import os
 import shlex
-import socket
 import subprocess
 import sys
-from concurrent.futures.thread import ThreadPoolExecutor
 from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
 from types import ModuleType
-from typing import Tuple, List, Optional
+from typing import Tuple, List, Optional, Dict, Iterable
 
-import psutil
 from loguru import logger
 
+ROOT_MARKERS = (".git", "yoyo.yml")
+
 
 @contextlib.contextmanager
 def cd_python(path: Path):
@@ -30,6 +29,21 @@ def cd_python(path: Path):
         del sys.path[0]
 
 
+def find_root(start: Optional[Path] = None) -> Path:
+    """Closest directory at or above `start` holding a git repo or yoyo config, found without a git subprocess."""
+    start = (start or Path.cwd()).resolve()
+    for directory in (start, *start.parents):
+        if any((directory / marker).exists() for marker in ROOT_MARKERS):
+            return directory
+    return start
+
+
+def import_object(path: str):
+    """Import 'package.module:attr' on demand."""
+    module, _, attr = path.partition(':')
+    return getattr(importlib.import_module(module), attr)
+
+
 def load_module(python_root: Path, module_path: Path) -> Optional[ModuleType]:
     with cd_python(python_root):
         spec = importlib.util.spec_from_file_location("*", module_path)
@@ -74,24 +88,34 @@ def get_env(env=None):
     return os_env
 
 
-def run_cmd(cmd, env=None):
+def run_cmd(cmd, env=None, cwd=None, pass_fds=()):
     return subprocess.Popen(shlex.split(cmd), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=get_env(env),
-                            universal_newlines=True)
+                            cwd=cwd, pass_fds=pass_fds, universal_newlines=True)
 
 
-def run_cmd_get_output(cmd, env=None):
+def run_cmd_get_output(cmd, env=None, cwd=None):
     result = subprocess.run(
-        shlex.split(cmd), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, encoding='utf-8', env=get_env(env)
+        shlex.split(cmd), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, encoding='utf-8', env=get_env(env),
+        cwd=cwd
     )
     result.check_returncode()
     return result.stdout.strip()
 
 
-def run_cmd_stream_output(cmd, env=None):
-    print(f"Executing command: {cmd}")
-    result = subprocess.run(shlex.split(cmd), env=get_env(env))
-    result.check_returncode()
-    return result
+def run_cmd_stream_output(cmd, env=None, cwd=None, stream_as: Optional[Tuple[str, str]] = None):
+    """Run to completion, streaming output directly or, given `stream_as=(name, colour)`, prefixed with the name."""
+    if stream_as is None:
+        print(f"Executing command: {cmd}")
+        result = subprocess.run(shlex.split(cmd), env=get_env(env), cwd=cwd)
+        result.check_returncode()
+        return result
+    name, colour = stream_as
+    logger.opt(colors=True).info(f"[{name}] {colorize(f'Executing command: {cmd}', colour)}")
+    process = run_cmd(cmd, env=env, cwd=cwd)
+    stream_process_output(ProcessToStream(name, process, colour))
+    if process.wait():
+        raise subprocess.CalledProcessError(process.returncode, cmd)
+    return process
 
 
 @dataclass
@@ -105,72 +129,30 @@ class ProcessToStream:
         return self.process.stdout
 
 
-def stream_multiple_processes(processes: List[Tuple[str, subprocess.Popen]]):
-    colours = [rgb_to_logger_rgb(c) for c in get_n_colours(len(processes))]
-    processes_to_stream = [
-        ProcessToStream(process_name, process, colour)
-        for (process_name, process), colour in zip(processes, colours)
-    ]
-    executor = ThreadPoolExecutor(max_workers=len(processes))
-    executor.map(stream_process_output, processes_to_stream)
-
-
 def stream_process_output(process: ProcessToStream):
     for line in process.stdout:
         logline = line.strip('\n')
         logger.opt(colors=True).info(f"[{process.name}] {colorize(logline, process.colour)}")
 
 
+def get_colours(names: Iterable[str]) -> Dict[str, str]:
+    names = list(names)
+    return dict(zip(names, (rgb_to_logger_rgb(c) for c in get_n_colours(len(names)))))
+
+
 def get_n_colours(n):
     hsv_tuples = [(x * 1.0 / n, 0.5, 0.5) for x in range(n)]
     rgb = [[int(i * 255) for i in colorsys.hsv_to_rgb(*hsv)] for hsv in hsv_tuples]
     return rgb
 
 
-def find_free_port():
-    with contextlib.closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as s:
-        s.bind(('', 0))
-        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        return s.getsockname()[1]
-
-
 def newer_than(target_file: Path, *comparison_files: Path):
     newest = max(f.stat().st_mtime for f in comparison_files)
     return target_file.stat().st_mtime > newest
 
 
-@contextlib.contextmanager
-def build_virtualenv(loc: Path, force=False):
-    env = {
-        "POETRY_VIRTUALENVS_CREATE": 'false',
-    }
-    with cd_python(loc):
-        if force:
-            run_cmd_stream_output(f"pyenv uninstall --force {loc.name}", env=env)
-            run_cmd_stream_output(f"pyenv virtualenv --force 3.9.0 {loc.name}", env=env)
-        env = set_venv(str(loc.name), env)
-        run_cmd_stream_output(f"poetry install", env=env)
-        yield env
-
-
-def set_venv(name, env):
-    env['PYENV_VERSION'] = name
-    try:
-        run_cmd_stream_output(f"pyenv local {name}", env=env)
-    except subprocess.CalledProcessError:
-        print(f"Creating virtualenv: {name}")
-        run_cmd_stream_output(f"pyenv virtualenv 3.9.0 {name}", env=env)
-        run_cmd_stream_output(f"pyenv local {name}", env=env)
-    path = Path(run_cmd_get_output("pyenv which python", env=env))
-    virtualenv_dir = path.parent.parent
-    env.update({
-        'PYENV_VIRTUAL_ENV': str(virtualenv_dir),
-        'VIRTUAL_ENV': str(virtualenv_dir),
-    })
-    return env
-
-
 def search_processes(keywords: List[str]) -> List[dict]:
+    import psutil
     matches = []
     for p in psutil.process_iter(attrs=["pid", "name", "cmdline", "create_time"]):
         if p.info['cmdline'] is None:
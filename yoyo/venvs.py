@@ -0,0 +1,146 @@
+import hashlib
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from loguru import logger
+from yoyo.artifact_store import ArtifactStore, locked_dists
+from yoyo.path_mapper import PathMap
+from yoyo.state import JsonState
+from yoyo.utils import run_cmd_stream_output, run_cmd_get_output
+
+PYTHON_VERSION = "3.9.0"
+DEFAULT_BUILD_WORKERS = min(4, os.cpu_count() or 1)
+DEPENDENCY_FILES = ("pyproject.toml", "poetry.lock", "setup.py", "requirements.txt")
+
+BuildResult = Tuple[str, Optional[dict], Optional[Exception]]
+
+
+class VirtualenvState(JsonState):
+    """Dependency fingerprint of each service's last successful install, used to skip `poetry install`."""
+
+    def record(self, service: str, fingerprint: str, virtualenv_dir: Path):
+        self.set(service, {"fingerprint": fingerprint, "virtualenv": str(virtualenv_dir)})
+
+
+def dependency_files(path_map: PathMap, service: str) -> List[Path]:
+    """Files whose contents decide what `poetry install` does, including those of symlinked callee models."""
+    service_dir = path_map.service_dir(service)
+    files = [service_dir / f for f in DEPENDENCY_FILES]
+    for linked_dir in sorted(path_map.get_linked_dirs(service)):
+        files.extend(linked_dir / f for f in DEPENDENCY_FILES)
+    return files
+
+
+def dependency_fingerprint(files: Iterable[Path], interpreter: str) -> str:
+    digest = hashlib.sha256(interpreter.encode())
+    for f in files:
+        digest.update(str(f).encode())
+        try:
+            digest.update(f.read_bytes())
+        except FileNotFoundError:
+            digest.update(b"<missing>")
+    return digest.hexdigest()
+
+
+def interpreter_version(virtualenv_dir: Path) -> Optional[str]:
+    try:
+        cfg = (virtualenv_dir / "pyvenv.cfg").read_text()
+    except FileNotFoundError:
+        return None
+    for line in cfg.splitlines():
+        key, _, value = line.partition('=')
+        if key.strip() in ('version', 'version_info'):
+            return value.strip()
+    return None
+
+
+def build_virtualenv(path_map: PathMap, service: str, state: Optional[VirtualenvState] = None, force=False,
+                     stream_as: Optional[Tuple[str, str]] = None, store: Optional[ArtifactStore] = None) -> dict:
+    """
+    Make sure the service has an up-to-date pyenv virtualenv, returns the env to run it with.
+    The install is skipped if the service's dependency fingerprint matches the one recorded in `state`, otherwise
+    distributions already in `store` are linked in before `poetry install` so it only fetches what's missing.
+    """
+    loc = path_map.service_dir(service)
+    files = dependency_files(path_map, service)
+    if not force and state is not None and (cached := state.get(service)):
+        virtualenv_dir = Path(cached['virtualenv'])
+        interpreter = interpreter_version(virtualenv_dir)
+        if interpreter and cached['fingerprint'] == dependency_fingerprint(files, interpreter):
+            logger.info(f"♻️ Virtualenv for '{service}' is up to date, skipping install.")
+            return venv_env(service, virtualenv_dir)
+
+    env = {
+        "POETRY_VIRTUALENVS_CREATE": 'false',
+    }
+    if store is not None:
+        store.to_env(env)
+    if force:
+        run_cmd_stream_output(f"pyenv uninstall --force {loc.name}", env=env, cwd=loc, stream_as=stream_as)
+        run_cmd_stream_output(f"pyenv virtualenv --force {PYTHON_VERSION} {loc.name}", env=env, cwd=loc,
+                              stream_as=stream_as)
+    env = set_venv(loc, env, stream_as=stream_as)
+    virtualenv_dir = Path(env['VIRTUAL_ENV'])
+    if store is not None and (seeded := store.seed(virtualenv_dir, locked_dists(loc / "poetry.lock"))):
+        logger.info(f"📦 Linked {seeded} distribution(s) into '{service}' from the artifact store.")
+    run_cmd_stream_output(f"poetry install", env=env, cwd=loc, stream_as=stream_as)
+    if store is not None:
+        store.add(virtualenv_dir)
+    if state is not None:
+        interpreter = interpreter_version(virtualenv_dir) or PYTHON_VERSION
+        state.record(service, dependency_fingerprint(files, interpreter), virtualenv_dir)
+    return env
+
+
+def set_venv(loc: Path, env, stream_as: Optional[Tuple[str, str]] = None):
+    name = loc.name
+    env['PYENV_VERSION'] = name
+    try:
+        run_cmd_stream_output(f"pyenv local {name}", env=env, cwd=loc, stream_as=stream_as)
+    except subprocess.CalledProcessError:
+        logger.info(f"Creating virtualenv: {name}")
+        run_cmd_stream_output(f"pyenv virtualenv {PYTHON_VERSION} {name}", env=env, cwd=loc, stream_as=stream_as)
+        run_cmd_stream_output(f"pyenv local {name}", env=env, cwd=loc, stream_as=stream_as)
+    path = Path(run_cmd_get_output("pyenv which python", env=env, cwd=loc))
+    return venv_env(name, path.parent.parent, env)
+
+
+def venv_env(name: str, virtualenv_dir: Path, env: Optional[dict] = None) -> dict:
+    env = dict(env or {"POETRY_VIRTUALENVS_CREATE": 'false'})
+    env.update({
+        'PYENV_VERSION': name,
+        'PYENV_VIRTUAL_ENV': str(virtualenv_dir),
+        'VIRTUAL_ENV': str(virtualenv_dir),
+    })
+    return env
+
+
+def build_virtualenvs(path_map: PathMap, services: Iterable[str], colours: Dict[str, str],
+                      workers: int = DEFAULT_BUILD_WORKERS, force=False) -> Iterator[BuildResult]:
+    """Build venvs on a pool of `workers`, yielding (service, env, error) as each one finishes."""
+    state = VirtualenvState(path_map.venv_state_file)
+    store = ArtifactStore.from_env()
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        futures = {
+            executor.submit(
+                build_virtualenv, path_map, service, state, force, (service, colours[service]), store
+            ): service
+            for service in services
+        }
+        for future in as_completed(futures):
+            service = futures[future]
+            try:
+                yield service, future.result(), None
+            except Exception as e:
+                yield service, None, e
+
+
+def log_build_failures(failures: Dict[str, Exception]):
+    if not failures:
+        return
+    logger.error(f"❌ Failed to build {len(failures)} virtualenv(s):")
+    for service, error in sorted(failures.items()):
+        logger.error(f" • {service}: {error}")
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set
+
+from loguru import logger
+from yoyo.build_context import BuildContext, FileHashes
+from yoyo.config import WatchSettings
+from yoyo.path_mapper import PathMap
+
+
+@dataclass
+class Reload:
+    restart: Set[str] = field(default_factory=set)
+    resync: bool = False
+
+
+def plan_reload(paths: Iterable[Path], path_map: PathMap, graph) -> Reload:
+    """
+    Which services a batch of changed paths means restarting, and whether links need re-syncing.
+    A change to a service's models also restarts its callers, which import them through their symlinks.
+    """
+    reload = Reload()
+    for path in paths:
+        try:
+            service, *rest = path.relative_to(path_map.services_dir).parts
+        except ValueError:
+            continue
+        if not rest:
+            reload.resync = True
+            continue
+        top = Path(rest[0])
+        if top == path_map.paths.service_links_subdir:
+            continue
+        reload.restart.add(service)
+        if top == path_map.paths.link_spec_file:
+            reload.resync = True
+        elif top == path_map.paths.service_models_subdir:
+            reload.restart.update(graph.callers.get(service, ()))
+    return reload
+
+
+class ServiceWatcher:
+    """
+    Reloads the services a LocalStack runs when files under the services dir change.
+    Events are debounced and coalesced, so a checkout touching many files leads to one batched reload.
+    """
+
+    def __init__(self, cli, stack, settings: WatchSettings = WatchSettings()):
+        self.cli = cli
+        self.stack = stack
+        self.settings = settings
+        self.hashes = FileHashes(cli._absolute_paths.file_hashes_file)
+        self.digests: Dict[str, str] = {}
+
+    def run(self, stop_event: Optional[threading.Event] = None):
+        try:
+            from watchfiles import DefaultFilter, watch
+        except ImportError:
+            raise ImportError("Watch mode needs the optional 'watchfiles' package, install it with yoyo[watch].") from None
+        services_dir = self.cli._absolute_paths.services_dir
+        for service in self.stack.services:
+            self.changed(service)
+        logger.info(f"👀 Watching '{services_dir}' for changes...")
+        changes = watch(
+            services_dir, watch_filter=DefaultFilter(), debounce=self.settings.debounce_ms, step=self.settings.step_ms,
+            stop_event=stop_event, raise_interrupt=False
+        )
+        for batch in changes:
+            try:
+                self.reload(Path(path) for _, path in batch)
+            except Exception:
+                logger.exception("❌ Failed to reload after changes, waiting for the next ones.")
+
+    def reload(self, paths: Iterable[Path]):
+        reload = plan_reload(paths, self.cli._absolute_paths, self.cli._graph)
+        if reload.resync:
+            logger.info("🔗 Links changed, re-syncing...")
+            self.cli.__dict__.pop('_graph', None)
+            self.cli.sync()
+            self.stack.streamer.set_names(sorted(self.cli._graph.nodes))
+            if removed := set(self.stack.services) - self.cli._graph.nodes:
+                self.stack.stop(removed)
+        restart = sorted(
+            s for s in reload.restart if s in self.stack.services and s in self.cli._graph.nodes and self.changed(s)
+        )
+        self.hashes.save()
+        if restart:
+            logger.info(f"♻️ Reloading {', '.join(restart)}...")
+            self.stack.reload(restart)
+
+    def changed(self, service: str) -> bool:
+        """Whether the service's build context has changed since it was last seen, e.g. not after a no-op checkout."""
+        context = BuildContext.for_service(self.cli._absolute_paths, self.cli._graph, service, hashes=self.hashes)
+        try:
+            digest = context.digest()
+        except FileNotFoundError:
+            return True
+        changed, self.digests[service] = self.digests.get(service) != digest, digest
+        return changed